@@ -1,9 +1,30 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, has_request_context
+import click
 import os
 import gspread
 import logging
 import random  # ← ADD THIS LINE
+import threading
+import re
+from collections import OrderedDict, deque
+import bisect
+import fcntl
+import hashlib
+from contextlib import contextmanager
+import concurrent.futures
+import multiprocessing
+import time
 import json    # ← ADD THIS LINE if missing
+import copy
+import csv
+import io
+import zlib
+import mmap
+import struct
+import sys
+from array import array
+from datetime import date, timedelta
+from gspread.utils import numericise_all
 from google.oauth2.service_account import Credentials
 
 app = Flask(__name__)
@@ -100,30 +121,146 @@ def init_google_sheets():
 # Initialize the client
 sheets_client = init_google_sheets()
 
+# Google Sheets quota handling
+SHEETS_REQUESTS_PER_MINUTE = int(os.getenv("SHEETS_REQUESTS_PER_MINUTE", "60"))
+SHEETS_MAX_QUEUE_WAIT = float(os.getenv("SHEETS_MAX_QUEUE_WAIT", "10"))
+SHEETS_MAX_RETRIES = 5
+SHEETS_RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Bucket state shared by every worker process on the host
+SHEETS_QUOTA_STATE = os.getenv("SHEETS_QUOTA_STATE", "sheets_quota.json")
+
+class SheetsQuotaExceeded(Exception):
+    """Raised when no request budget frees up within SHEETS_MAX_QUEUE_WAIT"""
+
+class SheetsQuota:
+    """Token-bucket request budget and retry policy for Google Sheets calls.
+    
+    The bucket holds one token per request allowed per minute and refills
+    continuously. call() waits (queues) for a token when the budget is
+    exhausted, and retries 429 and 5xx responses with jittered
+    exponential backoff, so bursts are smoothed instead of failing.
+    
+    Google enforces the quota per project, so the bucket and its counters
+    live in a small state file updated under flock, and all worker
+    processes draw from the same budget.
+    """
+    COUNTERS = ('requests', 'retries', 'throttled', 'failures')
+    
+    def __init__(self, per_minute, state_path=SHEETS_QUOTA_STATE):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.state_path = state_path
+        self.lock = threading.Lock()
+    
+    @contextmanager
+    def shared_state(self):
+        """Read-modify-write the shared bucket state, refilled to now"""
+        with self.lock, open(self.state_path, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or '{}')
+                except ValueError:
+                    state = {}
+                now = time.time()
+                state.setdefault('tokens', self.capacity)
+                state['tokens'] = min(self.capacity, state['tokens'] + max(now - state.get('updated', now), 0) * self.rate)
+                state['updated'] = now
+                for counter in self.COUNTERS:
+                    state.setdefault(counter, 0)
+                state.setdefault('last_error', None)
+                
+                yield state
+                
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    
+    def acquire(self, max_wait=SHEETS_MAX_QUEUE_WAIT):
+        deadline = time.monotonic() + max_wait
+        throttled = False
+        while True:
+            with self.shared_state() as state:
+                if state['tokens'] >= 1:
+                    state['tokens'] -= 1
+                    state['requests'] += 1
+                    return
+                if not throttled:
+                    state['throttled'] += 1
+                    throttled = True
+                wait = (1 - state['tokens']) / self.rate
+            if time.monotonic() + wait > deadline:
+                raise SheetsQuotaExceeded(f"Sheets request budget exhausted for {max_wait:.0f}s")
+            time.sleep(wait)
+    
+    def call(self, fn, *args, **kwargs):
+        """Run one Sheets API call within the budget, retrying transient errors"""
+        for attempt in range(SHEETS_MAX_RETRIES + 1):
+            self.acquire()
+            try:
+                return fn(*args, **kwargs)
+            except gspread.exceptions.APIError as e:
+                status = getattr(e.response, 'status_code', None)
+                give_up = status not in SHEETS_RETRY_STATUSES or attempt == SHEETS_MAX_RETRIES
+                with self.shared_state() as state:
+                    state['last_error'] = f"{status}: {e}"
+                    state['failures' if give_up else 'retries'] += 1
+                if give_up:
+                    raise
+                backoff = min(2 ** attempt, 32)
+                time.sleep(backoff / 2 + random.uniform(0, backoff / 2))
+    
+    def status(self):
+        with self.shared_state() as state:
+            return {
+                'requests_per_minute': int(self.capacity),
+                'headroom': int(state['tokens']),
+                'last_error': state['last_error'],
+                **{counter: state[counter] for counter in self.COUNTERS}
+            }
+
+sheets_quota = SheetsQuota(SHEETS_REQUESTS_PER_MINUTE)
+
+# Threads for Sheets calls that can run concurrently (e.g. the worksheet reads in load_data)
+SHEETS_IO_WORKERS = int(os.getenv("SHEETS_IO_WORKERS", "4"))
+sheets_io_pool = concurrent.futures.ThreadPoolExecutor(max_workers=SHEETS_IO_WORKERS, thread_name_prefix='sheets-io')
+
 class GoogleSheetsManager:
-    def __init__(self):
+    WORKSHEET_HEADERS = {
+        'players': ['Player Name', 'Games Played', 'Wins', 'Total Goals', 'Average Rating', 'Last Played', 'Position', 'Skill Level', 'Player ID', 'Assists', 'MVP Awards', 'Rated Games'],
+        'games': ['Game ID', 'Date', 'Team A Score', 'Team B Score', 'Location', 'Notes', 'Team A Players', 'Team B Players', 'Events'],
+        'current_players': ['Name', 'Position', 'Skill Level']
+    }
+
+    def __init__(self, sheet_id=None):
         self.sheet = None
         self.client = None
+        self.sheet_id = sheet_id
+        self.sheet_ids = {}
         self.setup_sheets()
     
     def setup_sheets(self):
         """Initialize Google Sheets connection using environment variables"""
         try:
+            if not self.sheet_id:
+                logger.info("No Google Sheet configured, using local storage only")
+                return
+            
             creds = get_google_credentials()
             if not creds:
                 logger.warning("Google Sheets credentials not available, using local storage fallback")
                 return
             
+            sheet_id = self.sheet_id
             self.client = gspread.authorize(creds)
-            sheet_id = os.getenv("GOOGLE_SHEETS_ID")
-            
-            if not sheet_id:
-                logger.warning("GOOGLE_SHEETS_ID not set, using local storage fallback")
-                return
             
             # Try to open the existing sheet
             try:
-                self.sheet = self.client.open_by_key(sheet_id)
+                self.sheet = sheets_quota.call(self.client.open_by_key, sheet_id)
                 logger.info(f"✅ Connected to Google Sheet: {sheet_id}")
                 self.initialize_worksheets()
             except gspread.SpreadsheetNotFound:
@@ -142,38 +279,47 @@ class GoogleSheetsManager:
         if not self.sheet:
             return
             
-        worksheets = {
-            'players': ['Player Name', 'Games Played', 'Wins', 'Total Goals', 'Average Rating', 'Last Played', 'Position', 'Skill Level'],
-            'games': ['Game ID', 'Date', 'Team A Score', 'Team B Score', 'Location', 'Notes', 'Team A Players', 'Team B Players'],
-            'current_players': ['Name', 'Position', 'Skill Level']
-        }
-        
-        for sheet_name, headers in worksheets.items():
+        for sheet_name, headers in self.WORKSHEET_HEADERS.items():
             try:
                 # Try to get existing worksheet
-                self.sheet.worksheet(sheet_name)
+                sheets_quota.call(self.sheet.worksheet, sheet_name)
                 logger.info(f"Worksheet '{sheet_name}' already exists")
             except gspread.WorksheetNotFound:
                 try:
                     # Create new worksheet if it doesn't exist
-                    worksheet = self.sheet.add_worksheet(title=sheet_name, rows="100", cols=str(len(headers)))
-                    worksheet.append_row(headers)
+                    worksheet = sheets_quota.call(self.sheet.add_worksheet, title=sheet_name, rows="100", cols=str(len(headers)))
+                    sheets_quota.call(worksheet.append_row, headers)
                     logger.info(f"Created worksheet '{sheet_name}' with headers")
                 except Exception as e:
                     logger.error(f"Error creating worksheet '{sheet_name}': {e}")
     
-    def load_data(self):
-        """Load data from Google Sheets"""
+    def load_data(self, strict=False):
+        """Load data from Google Sheets.
+        
+        Errors are logged and the affected worksheet is skipped, unless
+        strict is set, in which case they are raised.
+        """
         if not self.sheet:
             return self.get_default_data()
         
         try:
             data = self.get_default_data()
             
+            # Read all worksheets in one batchGet; if that fails (e.g. a missing
+            # worksheet), fall back to concurrent per-worksheet reads
+            try:
+                fetch = self.fetch_all_records().__getitem__
+            except Exception as e:
+                logger.warning(f"batchGet failed, reading worksheets individually: {e}")
+                pending = {
+                    sheet_name: sheets_io_pool.submit(self.fetch_records, sheet_name)
+                    for sheet_name in self.WORKSHEET_HEADERS
+                }
+                fetch = lambda sheet_name: pending[sheet_name].result()
+            
             # Load players
             try:
-                players_ws = self.sheet.worksheet('players')
-                player_records = players_ws.get_all_records()
+                player_records = fetch('players')
                 for record in player_records:
                     if record.get('Player Name'):
                         data['players'][record['Player Name']] = {
@@ -183,15 +329,20 @@ class GoogleSheetsManager:
                             'average_rating': float(record.get('Average Rating', 0)),
                             'last_played': record.get('Last Played', ''),
                             'position': record.get('Position', ''),
-                            'skill_level': int(record.get('Skill Level', 5))
+                            'skill_level': int(record.get('Skill Level', 5)),
+                            'id': int(record['Player ID']) if record.get('Player ID') not in (None, '') else None,
+                            'assists': int(record.get('Assists') or 0),
+                            'mvp_awards': int(record.get('MVP Awards') or 0),
+                            'rated_games': int(record.get('Rated Games') or 0)
                         }
             except Exception as e:
                 logger.error(f"Error loading players: {e}")
+                if strict:
+                    raise
             
             # Load games
             try:
-                games_ws = self.sheet.worksheet('games')
-                game_records = games_ws.get_all_records()
+                game_records = fetch('games')
                 for record in game_records:
                     if record.get('Game ID'):
                         data['games'].append({
@@ -206,15 +357,17 @@ class GoogleSheetsManager:
                                 'players': json.loads(record.get('Team B Players', '[]'))
                             },
                             'location': record.get('Location', ''),
-                            'notes': record.get('Notes', '')
+                            'notes': record.get('Notes', ''),
+                            'events': json.loads(record.get('Events') or '{}')
                         })
             except Exception as e:
                 logger.error(f"Error loading games: {e}")
+                if strict:
+                    raise
             
             # Load current players
             try:
-                current_ws = self.sheet.worksheet('current_players')
-                current_records = current_ws.get_all_records()
+                current_records = fetch('current_players')
                 for record in current_records:
                     if record.get('Name'):
                         data['current_players'].append({
@@ -224,159 +377,2326 @@ class GoogleSheetsManager:
                         })
             except Exception as e:
                 logger.error(f"Error loading current players: {e}")
+                if strict:
+                    raise
             
             logger.info(f"Loaded data: {len(data['games'])} games, {len(data['players'])} players")
             return data
             
         except Exception as e:
             logger.error(f"Error loading from Google Sheets: {e}")
+            if strict:
+                raise
             return self.get_default_data()
     
+    def fetch_records(self, sheet_name):
+        """Read all rows of one worksheet as header-keyed records"""
+        worksheet = sheets_quota.call(self.sheet.worksheet, sheet_name)
+        return sheets_quota.call(worksheet.get_all_records)
+    
+    def read_fingerprint(self):
+        """Fingerprint of the data currently in the spreadsheet (see data_fingerprint)"""
+        records = self.fetch_all_records()
+        return data_fingerprint(
+            [record['Game ID'] for record in records['games'] if record.get('Game ID')],
+            [record['Player Name'] for record in records['players'] if record.get('Player Name')]
+        )
+    
+    def fetch_all_records(self):
+        """Read every worksheet with a single values batchGet request"""
+        sheet_names = list(self.WORKSHEET_HEADERS)
+        response = sheets_quota.call(self.sheet.values_batch_get, [f"'{name}'" for name in sheet_names])
+        value_ranges = response.get('valueRanges', [])
+        return {
+            sheet_name: self.parse_records(value_range.get('values', []))
+            for sheet_name, value_range in zip(sheet_names, value_ranges)
+        }
+    
+    @staticmethod
+    def parse_records(values):
+        """Turn a header row plus data rows into records, like get_all_records()"""
+        if not values:
+            return []
+        
+        headers = values[0]
+        records = []
+        for row in values[1:]:
+            row = row + [''] * (len(headers) - len(row))
+            records.append(dict(zip(headers, numericise_all(row, empty2zero=False, default_blank=''))))
+        return records
+    
     def save_data(self, data):
-        """Save data to Google Sheets"""
+        """Save data to Google Sheets in a single atomic batchUpdate"""
         if not self.sheet:
             logger.warning("Google Sheets not available, cannot save")
             return False
         
         try:
-            # Save players
+            self.write_worksheets({
+                'players': [self.player_to_row(name, stats) for name, stats in data['players'].items()],
+                'games': [self.game_to_row(game) for game in data['games']],
+                'current_players': [
+                    [player['name'], player['position'], player['skill_level']]
+                    for player in data['current_players']
+                ]
+            })
+            logger.info(f"✅ Saved data to Google Sheets: {len(data['games'])} games, {len(data['players'])} players")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error saving to Google Sheets: {e}")
+            return False
+    
+    def write_worksheets(self, rows_by_sheet):
+        """Replace the contents of whole worksheets in one spreadsheets.batchUpdate.
+        
+        Each worksheet is resized to exactly its header plus rows (dropping
+        any stale rows) and its cells are overwritten. The Sheets API applies
+        a batchUpdate atomically, so either every worksheet is written or
+        none is.
+        """
+        sheet_ids = self.get_sheet_ids()
+        requests = []
+        for sheet_name, rows in rows_by_sheet.items():
+            headers = self.WORKSHEET_HEADERS[sheet_name]
+            sheet_id = sheet_ids[sheet_name]
+            requests.append({
+                'updateSheetProperties': {
+                    'properties': {
+                        'sheetId': sheet_id,
+                        'gridProperties': {'rowCount': len(rows) + 1, 'columnCount': len(headers)}
+                    },
+                    'fields': 'gridProperties(rowCount,columnCount)'
+                }
+            })
+            requests.append({
+                'updateCells': {
+                    'start': {'sheetId': sheet_id, 'rowIndex': 0, 'columnIndex': 0},
+                    'rows': [
+                        {'values': [self.cell(value) for value in row]}
+                        for row in [headers] + rows
+                    ],
+                    'fields': 'userEnteredValue'
+                }
+            })
+        sheets_quota.call(self.sheet.batch_update, {'requests': requests})
+    
+    def get_sheet_ids(self):
+        """Worksheet title -> sheetId, fetched once and cached"""
+        if not self.sheet_ids or not set(self.WORKSHEET_HEADERS) <= set(self.sheet_ids):
+            self.sheet_ids = {ws.title: ws.id for ws in sheets_quota.call(self.sheet.worksheets)}
+        return self.sheet_ids
+    
+    @staticmethod
+    def cell(value):
+        """Wrap a Python value as a Sheets CellData userEnteredValue"""
+        if isinstance(value, bool):
+            return {'userEnteredValue': {'boolValue': value}}
+        if isinstance(value, (int, float)):
+            return {'userEnteredValue': {'numberValue': value}}
+        return {'userEnteredValue': {'stringValue': '' if value is None else str(value)}}
+    
+    @staticmethod
+    def player_to_row(name, stats):
+        """Flatten a player's stats into a players worksheet row"""
+        return [
+            name,
+            stats['games_played'],
+            stats['wins'],
+            stats['total_goals'],
+            stats['average_rating'],
+            stats['last_played'] or '',
+            stats.get('position', ''),
+            stats.get('skill_level', 5),
+            stats.get('id', ''),
+            stats.get('assists', 0),
+            stats.get('mvp_awards', 0),
+            stats.get('rated_games', 0)
+        ]
+    
+    @staticmethod
+    def game_to_row(game):
+        """Flatten a game dict into a games worksheet row"""
+        return [
+            game['id'],
+            game['date'],
+            game['team_a']['score'],
+            game['team_b']['score'],
+            game.get('location', ''),
+            game.get('notes', ''),
+            json.dumps(game['team_a']['players']),
+            json.dumps(game['team_b']['players']),
+            json.dumps(game['events'], separators=(',', ':')) if game.get('events') else ''
+        ]
+    
+    def get_default_data(self):
+        """Return default data structure"""
+        return {
+            'players': {},
+            'games': [],
+            'current_players': []
+        }
+
+# Local store / replication configuration
+DATA_FILE = os.getenv("DATA_FILE", "football_data.json")
+REPLICATION_RETRY_INTERVAL = float(os.getenv("REPLICATION_RETRY_INTERVAL", "30"))
+SUMMARY_RECENT_GAMES = 5
+SUMMARY_LEADERBOARD_SIZE = 5
+SUMMARY_MIN_GAMES = 3
+
+def data_fingerprint(game_ids, player_names):
+    """Structural fingerprint of a dataset: which games and players it holds.
+    
+    It survives the type changes of a round-trip through Sheets, so it can
+    tell whether the spreadsheet still holds what was last replicated.
+    """
+    digest = hashlib.sha1()
+    for value in sorted(str(game_id) for game_id in game_ids):
+        digest.update(value.encode('utf-8') + b'\0')
+    digest.update(b'\1')
+    for value in sorted(player_names):
+        digest.update(value.encode('utf-8') + b'\0')
+    return digest.hexdigest()
+
+def build_summary(data):
+    """Small read-only snapshot of a dataset for status and stats pages"""
+    players = data.get('players', {})
+    games = data.get('games', [])
+    
+    player_rows = sorted((
+        {
+            'name': name,
+            'games_played': stats.get('games_played', 0),
+            'wins': stats.get('wins', 0),
+            'total_goals': stats.get('total_goals', 0),
+            'assists': stats.get('assists', 0),
+            'average_rating': stats.get('average_rating', 0),
+            'last_played': stats.get('last_played')
+        }
+        for name, stats in players.items()
+    ), key=lambda row: -row['games_played'])
+    
+    regulars = [row for row in player_rows if row['games_played'] >= SUMMARY_MIN_GAMES]
+    win_rate = lambda row: row['wins'] / row['games_played']
+    
+    return {
+        'total_players': len(players),
+        'total_games': len(games),
+        'current_players_count': len(data.get('current_players', [])),
+        'players': player_rows,
+        'leaderboards': {
+            'wins': [row['name'] for row in sorted(player_rows, key=lambda row: -row['wins'])[:SUMMARY_LEADERBOARD_SIZE]],
+            'goals': [row['name'] for row in sorted(player_rows, key=lambda row: -row['total_goals'])[:SUMMARY_LEADERBOARD_SIZE]],
+            'win_rate': [row['name'] for row in sorted(regulars, key=lambda row: -win_rate(row))[:SUMMARY_LEADERBOARD_SIZE]]
+        },
+        'recent_games': [
+            {
+                'date': game.get('date'),
+                'score': [game['team_a'].get('score'), game['team_b'].get('score')],
+                'players': [len(game['team_a'].get('players', [])), len(game['team_b'].get('players', []))]
+            }
+            for game in games[-SUMMARY_RECENT_GAMES:][::-1]
+        ]
+    }
+
+class LocalStore:
+    """Durable local JSON store and the source of truth for reads and writes.
+    
+    Writes go to a temporary file that is fsynced and atomically renamed
+    over the data file. A sidecar .meta file records the data version and
+    the version/fingerprint last replicated to Google Sheets and the
+    games_version at which the game history was last replaced rather than
+    appended to, and a
+    .summary file holds the build_summary snapshot of the same version.
+    Streaming imports append their batches to an .import journal until
+    the whole stream has been merged into the data file.
+    Metadata updates are serialised across worker processes with flock.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.meta_path = f'{path}.meta'
+        self.summary_path = f'{path}.summary'
+        self.journal_path = f'{path}.import'
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+    
+    @contextmanager
+    def locked(self, name='lock', blocking=True):
+        """Hold an exclusive flock on a sidecar lock file; yields False if not blocking and busy"""
+        with open(f'{self.path}.{name}', 'a') as lock_file:
             try:
-                players_ws = self.sheet.worksheet('players')
-                players_ws.clear()
-                players_ws.append_row(['Player Name', 'Games Played', 'Wins', 'Total Goals', 'Average Rating', 'Last Played', 'Position', 'Skill Level'])
-                
-                player_rows = []
-                for name, stats in data['players'].items():
-                    player_rows.append([
-                        name,
-                        stats['games_played'],
-                        stats['wins'],
-                        stats['total_goals'],
-                        stats['average_rating'],
-                        stats['last_played'] or '',
-                        stats.get('position', ''),
-                        stats.get('skill_level', 5)
-                    ])
-                
-                if player_rows:
-                    players_ws.append_rows(player_rows)
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _write_json(self, path, payload, indent=None):
+        # json.dumps without indent runs the C encoder; json.dump to a file never does
+        tmp_path = f'{path}.tmp.{os.getpid()}.{threading.get_ident()}'
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps(payload, indent=indent))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    
+    def exists(self):
+        return os.path.exists(self.path)
+    
+    def read(self):
+        """Return the stored data, or None if nothing has been stored yet"""
+        if not self.exists():
+            return None
+        with open(self.path, 'r') as f:
+            return json.load(f)
+    
+    def read_meta(self):
+        try:
+            with open(self.meta_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            version = 1 if self.exists() else 0
+            return {'version': version, 'games_version': version, 'replicated_version': 0, 'replicated_fingerprint': None}
+    
+    def read_summary(self):
+        """Return the stored summary snapshot, materializing it for data written before snapshots existed"""
+        try:
+            with open(self.summary_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+        
+        with self.locked():
+            data = self.read()
+            summary = build_summary(data or {})
+            if data is not None:
+                self._write_json(self.summary_path, summary)
+            return summary
+    
+    def write(self, data, replicated_fingerprint=None, games_appended=False):
+        """Persist data as a new version; returns the version number.
+        
+        Pass games_appended=True when data['games'] is unchanged or only has
+        new games at the end, so game indexes can catch up incrementally.
+        """
+        with self.locked():
+            meta = self.read_meta()
+            self._write_json(self.path, data)
+            self._write_json(self.summary_path, build_summary(data))
+            meta['version'] += 1
+            if not games_appended:
+                meta['games_version'] = meta['version']
+            meta['updated_at'] = time.time()
+            if replicated_fingerprint is not None:
+                meta['replicated_version'] = meta['version']
+                meta['replicated_fingerprint'] = replicated_fingerprint
+            self._write_json(self.meta_path, meta)
+            return meta['version']
+    
+    def mark_replicated(self, version, fingerprint):
+        with self.locked():
+            meta = self.read_meta()
+            if version > meta['replicated_version']:
+                meta['replicated_version'] = version
+                meta['replicated_fingerprint'] = fingerprint
+                meta['replicated_at'] = time.time()
+                self._write_json(self.meta_path, meta)
+    
+    def update_meta(self, changes):
+        """Set (or, for None values, remove) metadata fields"""
+        with self.locked():
+            meta = self.read_meta()
+            for key, value in changes.items():
+                if value is None:
+                    meta.pop(key, None)
+                else:
+                    meta[key] = value
+            self._write_json(self.meta_path, meta)
+    
+    def append_journal(self, games, checkpoint):
+        """Durably append imported games to the import journal and record the stream checkpoint"""
+        with self.locked():
+            with open(self.journal_path, 'a') as f:
+                f.write(''.join(json.dumps(game) + '\n' for game in games))
+                f.flush()
+                os.fsync(f.fileno())
+            meta = self.read_meta()
+            meta['import_checkpoint'] = checkpoint
+            self._write_json(self.meta_path, meta)
+    
+    def read_journal(self):
+        """Games in the import journal; a line torn by a crash ends it"""
+        games = []
+        try:
+            with open(self.journal_path, 'r') as f:
+                for line in f:
+                    try:
+                        games.append(json.loads(line))
+                    except ValueError:
+                        break
+        except OSError:
+            pass
+        return games
+    
+    def clear_journal(self):
+        with self.locked():
+            try:
+                os.remove(self.journal_path)
+            except FileNotFoundError:
+                pass
+            meta = self.read_meta()
+            if meta.pop('import_checkpoint', None) is not None:
+                self._write_json(self.meta_path, meta)
+    
+    def write_conflict_copy(self, data):
+        path = f'{self.path}.conflict-{int(time.time())}'
+        self._write_json(path, data, indent=2)
+        return path
+
+class SheetsReplicator:
+    """Background worker that mirrors the local store to Google Sheets.
+    
+    Saves only bump the local version and wake the worker, so request
+    latency never waits on Google. The worker pushes the newest version
+    (coalescing any intermediate ones), retries every
+    REPLICATION_RETRY_INTERVAL seconds while behind, and only one worker
+    process replicates at a time. Before overwriting the spreadsheet it
+    compares the sheet's fingerprint with the one it last wrote. If someone
+    edited the sheet in the meantime, the remote copy is saved next to the
+    data file and counted as a conflict; the local store still wins.
+    
+    A spreadsheet holding data that was never replicated from this store
+    (say, a worker that started during an outage wrote locally) is left
+    untouched: its contents are saved once and replication is held until
+    resolve_conflict() picks a side. A worker that could not reach Sheets
+    at startup keeps retrying the connection on every pass.
+    """
+    def __init__(self, store, manager):
+        self.store = store
+        self.manager = manager
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.stats = {'replications': 0, 'conflicts': 0, 'last_error': None, 'last_conflict_copy': None}
+    
+    @property
+    def enabled(self):
+        return bool(self.manager.sheet_id)
+    
+    def connected(self):
+        """Whether Sheets is reachable, reconnecting if startup could not connect"""
+        if self.manager.sheet is None:
+            self.manager.setup_sheets()
+        return self.manager.sheet is not None
+    
+    def start(self):
+        if not self.enabled or self.stopped.is_set() or (self.thread and self.thread.is_alive()):
+            return
+        self.thread = threading.Thread(target=self._run, name='sheets-replicator', daemon=True)
+        self.thread.start()
+        self.wakeup.set()
+    
+    def notify(self):
+        if self.enabled:
+            self.start()
+            self.wakeup.set()
+    
+    def stop(self):
+        """Let the worker thread exit after its current pass"""
+        self.stopped.set()
+        self.wakeup.set()
+    
+    def _run(self):
+        while not self.stopped.is_set():
+            self.wakeup.wait(REPLICATION_RETRY_INTERVAL)
+            self.wakeup.clear()
+            if self.stopped.is_set():
+                break
+            try:
+                self.replicate_once()
+                self.stats['last_error'] = None
             except Exception as e:
-                logger.error(f"Error saving players: {e}")
+                self.stats['last_error'] = str(e)
+                logger.error(f"❌ Replication to Google Sheets failed: {e}")
+    
+    def replicate_once(self):
+        """Push the latest local version to Sheets if it is not there yet"""
+        with self.store.locked('replicate', blocking=False) as acquired:
+            if not acquired:
                 return False
             
-            # Save games
-            try:
-                games_ws = self.sheet.worksheet('games')
-                games_ws.clear()
-                games_ws.append_row(['Game ID', 'Date', 'Team A Score', 'Team B Score', 'Location', 'Notes', 'Team A Players', 'Team B Players'])
-                
-                game_rows = []
-                for game in data['games']:
-                    game_rows.append([
-                        game['id'],
-                        game['date'],
-                        game['team_a']['score'],
-                        game['team_b']['score'],
-                        game.get('location', ''),
-                        game.get('notes', ''),
-                        json.dumps(game['team_a']['players']),
-                        json.dumps(game['team_b']['players'])
-                    ])
-                
-                if game_rows:
-                    games_ws.append_rows(game_rows)
-            except Exception as e:
-                logger.error(f"Error saving games: {e}")
+            meta = self.store.read_meta()
+            if meta['version'] <= meta['replicated_version'] or meta.get('held_conflict'):
                 return False
+            if not self.connected():
+                raise RuntimeError("Google Sheets is unreachable")
+            with self.store.locked():
+                version = self.store.read_meta()['version']
+                data = self.store.read()
+            
+            remote_fingerprint = self.manager.read_fingerprint()
+            empty_fingerprint = data_fingerprint([], [])
+            expected = meta.get('replicated_fingerprint')
+            if remote_fingerprint != (expected or empty_fingerprint):
+                self.stats['conflicts'] += 1
+                copy_path = self.store.write_conflict_copy(self.manager.load_data(strict=True))
+                self.stats['last_conflict_copy'] = copy_path
+                if expected is None:
+                    self.store.update_meta({'held_conflict': {
+                        'remote_fingerprint': remote_fingerprint,
+                        'copy_path': copy_path,
+                        'held_at': time.time()
+                    }})
+                    logger.error(f"❌ Spreadsheet holds data this store never replicated; saved it to {copy_path} and held replication")
+                    return False
+                logger.warning(f"⚠️ Spreadsheet was changed outside the app; saved remote copy to {copy_path}")
+            
+            if not self.manager.save_data(data):
+                raise RuntimeError("Google Sheets save failed")
             
-            # Save current players
+            fingerprint = data_fingerprint(
+                [game.get('id') for game in data.get('games', [])],
+                list(data.get('players', {}))
+            )
+            self.store.mark_replicated(version, fingerprint)
+            self.stats['replications'] += 1
+            logger.info(f"✓ Replicated version {version} to Google Sheets")
+            return True
+    
+    def resolve_conflict(self, keep):
+        """Settle a held conflict: keep='local' overwrites the sheet, keep='remote' replaces the local store"""
+        held = self.store.read_meta().get('held_conflict')
+        if not held:
+            return False
+        if not self.connected():
+            raise RuntimeError("Google Sheets is unreachable")
+        
+        if keep == 'remote':
+            data = self.manager.load_data(strict=True)
+            ensure_player_ids(data['players'])
+            self.store.write(data, replicated_fingerprint=self.manager.read_fingerprint())
+            self.store.update_meta({'held_conflict': None})
+        else:
+            # Treat the sheet's current contents as replicated, so the next pass overwrites them
+            self.store.update_meta({'held_conflict': None, 'replicated_fingerprint': held['remote_fingerprint']})
+        logger.info(f"✓ Resolved held replication conflict keeping the {keep} data")
+        return True
+    
+    def status(self):
+        meta = self.store.read_meta()
+        pending = max(meta['version'] - meta['replicated_version'], 0)
+        return {
+            'enabled': self.enabled,
+            'connected': self.manager.sheet is not None,
+            'held_conflict': meta.get('held_conflict'),
+            'version': meta['version'],
+            'replicated_version': meta['replicated_version'],
+            'pending_versions': pending,
+            'lag_seconds': round(time.time() - meta['updated_at'], 1) if pending and meta.get('updated_at') else 0,
+            'last_replicated_at': meta.get('replicated_at'),
+            **self.stats
+        }
+
+# Multi-tenant configuration: the 'default' group keeps DATA_FILE and
+# GOOGLE_SHEETS_ID, other groups live in GROUP_DATA_DIR with optional
+# spreadsheets from the TENANT_SHEETS JSON map
+DEFAULT_GROUP = 'default'
+GROUP_DATA_DIR = os.getenv("GROUP_DATA_DIR", "groups")
+TENANT_SHEETS = json.loads(os.getenv("TENANT_SHEETS", "{}"))
+ALLOWED_GROUPS = {group for group in os.getenv("ALLOWED_GROUPS", "").split(",") if group}
+TENANT_CACHE_MAX_BYTES = int(os.getenv("TENANT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+TENANT_MAX_ACTIVE = int(os.getenv("TENANT_MAX_ACTIVE", "64"))
+GROUP_ID_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]{0,63}$')
+
+class Tenant:
+    """Storage, replication and derived indexes of one football group"""
+    def __init__(self, name):
+        self.name = name
+        if name == DEFAULT_GROUP:
+            path, sheet_id = DATA_FILE, os.getenv("GOOGLE_SHEETS_ID")
+        else:
+            path, sheet_id = os.path.join(GROUP_DATA_DIR, f'{name}.json'), TENANT_SHEETS.get(name)
+        
+        self.store = LocalStore(path)
+        self.manager = GoogleSheetsManager(sheet_id)
+        self.replicator = SheetsReplicator(self.store, self.manager)
+        self.history_index = PlayerHistoryIndex()
+        self.synergy_index = SynergyIndex()
+        self.leaderboard_index = LeaderboardIndex()
+        self.date_index = GameDateIndex()
+        self.elo_index = EloIndex()
+        self.rotation_index = RotationIndex()
+    
+    def indexes(self):
+        return (
+            self.history_index, self.synergy_index, self.leaderboard_index,
+            self.date_index, self.elo_index, self.rotation_index
+        )
+    
+    def games_version(self):
+        """Store version at which the game history was last replaced, for GameIndex.sync()"""
+        return self.store.read_meta().get('games_version', 0)
+    
+    def sync_indexes(self, data):
+        """Bring every game-derived index up to date with data"""
+        version = self.games_version()
+        for index in self.indexes():
+            index.sync(data, version)
+    
+    def drop_indexes(self):
+        for index in self.indexes():
+            index.reset()
+    
+    def idle(self):
+        """True when nothing is waiting to be replicated, so the tenant can be dropped"""
+        if not self.replicator.enabled:
+            return True
+        meta = self.store.read_meta()
+        return meta['version'] <= meta['replicated_version']
+    
+    def load(self):
+        """Read the group's data, bootstrapping the local store from Google Sheets on first use"""
+        data = self.store.read()
+        
+        if data is None and self.manager.sheet:
+            data = self.manager.load_data(strict=True)
+            ensure_player_ids(data['players'])
+            self.store.write(data, replicated_fingerprint=self.manager.read_fingerprint())
+            logger.info(f"✓ Bootstrapped local store for '{self.name}' from Google Sheets")
+        
+        if data is None:
+            return self.manager.get_default_data()
+        
+        ensure_player_ids(data.get('players', {}))
+        return data
+    
+    def summary(self):
+        """The store's summary snapshot, bootstrapping a fresh store from Google Sheets first"""
+        if not self.store.exists() and self.manager.sheet:
             try:
-                current_ws = self.sheet.worksheet('current_players')
-                current_ws.clear()
-                current_ws.append_row(['Name', 'Position', 'Skill Level'])
-                
-                current_rows = []
-                for player in data['current_players']:
-                    current_rows.append([
-                        player['name'],
-                        player['position'],
-                        player['skill_level']
-                    ])
-                
-                if current_rows:
-                    current_ws.append_rows(current_rows)
+                tenants.load(self)
             except Exception as e:
-                logger.error(f"Error saving current players: {e}")
-                return False
+                logger.warning(f"⚠️ Could not bootstrap '{self.name}' from Google Sheets for its summary: {e}")
+        return self.store.read_summary()
+
+class TenantRegistry:
+    """Tenants by group name, with an LRU cache of their loaded datasets.
+    
+    A cached dataset is reused while the store's version is unchanged
+    (another worker process writing bumps it). Cached datasets are shared
+    and must not be modified; load_data(for_update=True) hands out a copy.
+    The cache is bounded by TENANT_CACHE_MAX_BYTES, measured by the size of
+    the data files. The least recently used groups are evicted together
+    with their indexes. At most max_tenants groups stay active: beyond that
+    the least recently used idle tenant is dropped with its replicator.
+    """
+    def __init__(self, max_bytes, max_tenants=TENANT_MAX_ACTIVE):
+        self.max_bytes = max_bytes
+        self.max_tenants = max_tenants
+        self._tenants = OrderedDict()
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+    
+    def get(self, name):
+        with self._lock:
+            tenant = self._tenants.get(name)
+            if tenant is not None:
+                self._tenants.move_to_end(name)
+        
+        if tenant is None:
+            # Connecting to a group's sheet makes network calls, so it must
+            # not hold up requests for other groups
+            created = Tenant(name)
+            with self._lock:
+                tenant = self._tenants.setdefault(name, created)
+                self._tenants.move_to_end(name)
+                if tenant is created:
+                    self._drop_idle_tenants(keep=name)
+        tenant.replicator.start()
+        return tenant
+    
+    def _drop_idle_tenants(self, keep):
+        """Drop least recently used idle tenants down to max_tenants, sparing keep"""
+        for name in list(self._tenants):
+            if len(self._tenants) <= self.max_tenants:
+                return
+            tenant = self._tenants[name]
+            if name in (DEFAULT_GROUP, keep) or not tenant.idle():
+                continue
+            tenant.replicator.stop()
+            self._discard(name)
+            del self._tenants[name]
+            logger.info(f"Dropped idle group '{name}'")
+    
+    def load(self, tenant):
+        # Read the version first: a write racing the load then only makes
+        # the cached copy look older than it is, never newer
+        version = tenant.store.read_meta()['version']
+        with self._lock:
+            entry = self._cache.get(tenant.name)
+            if entry and entry[0] == version:
+                self._cache.move_to_end(tenant.name)
+                return entry[2]
+        
+        data = tenant.load()
+        self.remember(tenant, version, data)
+        return data
+    
+    def remember(self, tenant, version, data):
+        size = os.path.getsize(tenant.store.path) if tenant.store.exists() else 0
+        with self._lock:
+            self._discard(tenant.name)
+            self._cache[tenant.name] = (version, size, data)
+            self._cached_bytes += size
+            while self._cached_bytes > self.max_bytes and len(self._cache) > 1:
+                evicted = next(iter(self._cache))
+                self._discard(evicted)
+                if evicted in self._tenants:
+                    self._tenants[evicted].drop_indexes()
+                logger.info(f"Evicted group '{evicted}' from the data cache")
+    
+    def forget(self, tenant):
+        with self._lock:
+            self._discard(tenant.name)
+    
+    def _discard(self, name):
+        entry = self._cache.pop(name, None)
+        if entry:
+            self._cached_bytes -= entry[1]
+    
+    def status(self):
+        with self._lock:
+            return {'groups': len(self._tenants), 'cached_groups': len(self._cache), 'cached_bytes': self._cached_bytes}
+
+tenants = TenantRegistry(TENANT_CACHE_MAX_BYTES)
+
+def current_group():
+    """The group addressed by the current request (X-Group-ID header or ?group=)"""
+    if not has_request_context():
+        return DEFAULT_GROUP
+    return request.headers.get('X-Group-ID') or request.args.get('group') or DEFAULT_GROUP
+
+def current_tenant():
+    return tenants.get(current_group())
+
+@app.before_request
+def check_group():
+    group = current_group()
+    if not GROUP_ID_PATTERN.match(group):
+        return jsonify({'error': f'Invalid group id: {group}'}), 400
+    if ALLOWED_GROUPS and group != DEFAULT_GROUP and group not in ALLOWED_GROUPS:
+        return jsonify({'error': f'Unknown group: {group}'}), 404
+
+def load_data(group=None, for_update=False):
+    """Load a group's data (the current request's group by default), served from the cache when fresh.
+    
+    The cached dataset is shared between requests, so callers that are
+    going to modify it must pass for_update=True to get their own copy
+    (see copy_for_update).
+    """
+    tenant = tenants.get(group or current_group())
+    data = tenants.load(tenant)
+    return copy_for_update(data) if for_update else data
+
+def copy_for_update(data):
+    """Copy the parts of a dataset that updates modify, sharing the rest.
+    
+    The top-level dict, the games list and the player and squad rows are
+    copied; game records are shared, so a game must be replaced rather
+    than edited in place.
+    """
+    return {
+        **data,
+        'players': {name: dict(stats) for name, stats in data.get('players', {}).items()},
+        'games': list(data.get('games', [])),
+        'current_players': [dict(player) for player in data.get('current_players', [])]
+    }
+
+def save_data(data, group=None, games_appended=False):
+    """Save a group's data to its local store and queue replication to Google Sheets.
+    
+    games_appended=True declares that games were only added at the end
+    (see LocalStore.write). data becomes the group's cached dataset, so
+    the caller must not modify it after saving.
+    """
+    tenant = tenants.get(group or current_group())
+    ensure_player_ids(data.get('players', {}))
+    
+    try:
+        version = tenant.store.write(data, games_appended=games_appended)
+    except Exception as e:
+        logger.error(f"Error saving data: {e}")
+        tenants.forget(tenant)
+        return False
+    
+    tenants.remember(tenant, version, data)
+    tenant.replicator.notify()
+    return True
+
+# Import configuration
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_MAX_REPORTED_ERRORS = 20
+IMPORT_READ_BUFFER = 64 * 1024
+
+def new_player_stats(position='unknown', skill_level=5):
+    """Return an empty stats record for a player"""
+    return {
+        'games_played': 0,
+        'wins': 0,
+        'total_goals': 0,
+        'average_rating': 0,
+        'last_played': None,
+        'position': position,
+        'skill_level': skill_level,
+        'assists': 0,
+        'mvp_awards': 0,
+        'rated_games': 0
+    }
+
+def ensure_player_ids(players):
+    """Assign stable integer IDs to player records that do not have one yet"""
+    next_id = max((stats['id'] for stats in players.values() if stats.get('id') is not None), default=-1) + 1
+    for stats in players.values():
+        if stats.get('id') is None:
+            stats['id'] = next_id
+            next_id += 1
+
+class PlayerRegistry:
+    """Maps player names to stable integer IDs and back.
+    
+    IDs are persisted on the player records, so they survive renames and
+    can be used as compact keys for rosters and per-player indexes.
+    """
+    def __init__(self, players=None):
+        self._ids = {}
+        self._names = []
+        if players:
+            self.sync(players)
+    
+    def __len__(self):
+        return len(self._ids)
+    
+    def __contains__(self, name):
+        return name in self._ids
+    
+    @property
+    def capacity(self):
+        """One past the highest assigned ID, for sizing ID-indexed arrays"""
+        return len(self._names)
+    
+    def sync(self, players):
+        """Register every player record, assigning IDs where missing.
+        
+        Returns True if an ID that was already bound now belongs to a
+        different name (a rename or a clash with an interned name).
+        """
+        ensure_player_ids(players)
+        rebound = False
+        for name, stats in players.items():
+            rebound = self._bind(name, stats['id']) or rebound
+        return rebound
+    
+    def _bind(self, name, player_id):
+        if player_id >= len(self._names):
+            self._names.extend([None] * (player_id + 1 - len(self._names)))
+        previous = self._names[player_id]
+        if previous is not None and previous != name:
+            self._ids.pop(previous, None)
+        self._ids[name] = player_id
+        self._names[player_id] = name
+        return previous is not None and previous != name
+    
+    def id_for(self, name):
+        return self._ids.get(name)
+    
+    def name_for(self, player_id):
+        return self._names[player_id] if 0 <= player_id < len(self._names) else None
+    
+    def intern(self, name):
+        """Return the ID for name, registering it if it is new"""
+        player_id = self._ids.get(name)
+        if player_id is None:
+            player_id = len(self._names)
+            self._bind(name, player_id)
+        return player_id
+    
+    def names(self):
+        """Names indexed by ID, with None for unused IDs"""
+        return list(self._names)
+
+class GameIndex:
+    """Base class for indexes derived from data['games'].
+    
+    sync() brings the index up to date with a loaded dataset: games
+    appended since the last sync are fed to add_game() one by one, and
+    anything else triggers a rebuild. version is the store's games_version,
+    which every write that replaces rather than appends to the history
+    bumps, so a re-import is noticed even when it has the same number of
+    games and the same last game id.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        self.registry = PlayerRegistry()
+        self._count = 0
+        self._last_id = None
+        self._version = None
+        self.clear()
+    
+    def clear(self):
+        """Drop all derived state"""
+    
+    def add_game(self, position, game):
+        raise NotImplementedError
+    
+    def rebuild(self, games):
+        """Index a full history into the freshly reset index; subclasses may do this in bulk"""
+        for position, game in enumerate(games):
+            self.add_game(position, game)
+    
+    def sync(self, data, version=None):
+        games = data.get('games', [])
+        with self._lock:
+            stale = self._count > len(games) or (
+                self._count and games[self._count - 1].get('id') != self._last_id
+            ) or (version is not None and version != self._version)
+            if self.registry.sync(data.get('players', {})) or stale:
+                self.reset()
+                self.registry.sync(data.get('players', {}))
+            
+            if self._count:
+                for position in range(self._count, len(games)):
+                    self.add_game(position, games[position])
+            else:
+                self.rebuild(games)
+            
+            self._count = len(games)
+            self._last_id = games[-1].get('id') if games else None
+            self._version = version
+        return self
+
+class PlayerHistoryIndex(GameIndex):
+    """Inverted index from player ID to the positions of the games they played"""
+    def clear(self):
+        self._games = []
+    
+    def add_game(self, position, game):
+        for team_key in ('team_a', 'team_b'):
+            for player in game[team_key]['players']:
+                player_id = self.registry.intern(player['name'])
+                if player_id >= len(self._games):
+                    self._games.extend(array('I') for _ in range(player_id + 1 - len(self._games)))
+                self._games[player_id].append(position)
+    
+    def count(self, name):
+        player_id = self.registry.id_for(name)
+        if player_id is None or player_id >= len(self._games):
+            return 0
+        return len(self._games[player_id])
+    
+    def positions(self, name, offset=0, limit=None):
+        """Game positions for a player, newest first"""
+        player_id = self.registry.id_for(name)
+        if player_id is None or player_id >= len(self._games):
+            return []
+        games = self._games[player_id]
+        end = len(games) - offset
+        start = 0 if limit is None else max(end - limit, 0)
+        return list(reversed(games[start:max(end, 0)]))
+
+# Virtual games that pull a pair's teammate win rate towards 50% when balancing
+SYNERGY_PRIOR_GAMES = 4
+
+class SynergyIndex(GameIndex):
+    """Pairwise teammate and opponent results for every pair of players.
+    
+    Counts live in flat row-major arrays indexed by player ID
+    (row * size + column), so a new game only touches the cells of the
+    pairs that played in it.
+    """
+    def clear(self):
+        self._size = 0
+        self.together_games = array('I')
+        self.together_wins = array('I')
+        self.against_games = array('I')
+        self.against_wins = array('I')
+    
+    def _grow(self, needed):
+        size = max(needed, self._size * 2, 16)
+        for attr in ('together_games', 'together_wins', 'against_games', 'against_wins'):
+            old = getattr(self, attr)
+            new = array('I', bytes(4 * size * size))
+            for row in range(self._size):
+                new[row * size:row * size + self._size] = old[row * self._size:(row + 1) * self._size]
+            setattr(self, attr, new)
+        self._size = size
+    
+    def add_game(self, position, game):
+        ids_a = [self.registry.intern(p['name']) for p in game['team_a']['players']]
+        ids_b = [self.registry.intern(p['name']) for p in game['team_b']['players']]
+        if self.registry.capacity > self._size:
+            self._grow(self.registry.capacity)
+        
+        size = self._size
+        score_a, score_b = game['team_a']['score'], game['team_b']['score']
+        for team, won in ((ids_a, score_a > score_b), (ids_b, score_b > score_a)):
+            for i in team:
+                for j in team:
+                    if i != j:
+                        self.together_games[i * size + j] += 1
+                        if won:
+                            self.together_wins[i * size + j] += 1
+        
+        for i in ids_a:
+            for j in ids_b:
+                self.against_games[i * size + j] += 1
+                self.against_games[j * size + i] += 1
+                if score_a > score_b:
+                    self.against_wins[i * size + j] += 1
+                elif score_b > score_a:
+                    self.against_wins[j * size + i] += 1
+    
+    def _cell(self, i, j):
+        if i is None or j is None or i >= self._size or j >= self._size:
+            return None
+        return i * self._size + j
+    
+    def teammate_record(self, player_id, other_id):
+        """(games, wins) for two player IDs playing on the same team"""
+        cell = self._cell(player_id, other_id)
+        if cell is None:
+            return 0, 0
+        return self.together_games[cell], self.together_wins[cell]
+    
+    def opponent_record(self, player_id, other_id):
+        """(games, wins) for player_id playing against other_id"""
+        cell = self._cell(player_id, other_id)
+        if cell is None:
+            return 0, 0
+        return self.against_games[cell], self.against_wins[cell]
+    
+    def pair(self, name, other):
+        player_id, other_id = self.registry.id_for(name), self.registry.id_for(other)
+        together_games, together_wins = self.teammate_record(player_id, other_id)
+        against_games, against_wins = self.opponent_record(player_id, other_id)
+        _, against_losses = self.opponent_record(other_id, player_id)
+        return {
+            'players': [name, other],
+            'together': {
+                'games': together_games,
+                'wins': together_wins,
+                'win_rate': together_wins / together_games if together_games else None
+            },
+            'against': {
+                'games': against_games,
+                'wins': against_wins,
+                'losses': against_losses,
+                'win_rate': against_wins / against_games if against_games else None
+            }
+        }
+    
+    def teammate_matrix(self, names, prior_games=SYNERGY_PRIOR_GAMES):
+        """Square matrix of teammate synergy for a squad, in squad order.
+        
+        Each cell is the pair's teammate win rate shrunk towards 50% by
+        prior_games virtual games, minus 0.5, so unknown pairs score 0.
+        """
+        ids = [self.registry.id_for(name) for name in names]
+        matrix = [[0.0] * len(names) for _ in names]
+        for i, player_id in enumerate(ids):
+            for j, other_id in enumerate(ids):
+                if i != j:
+                    games, wins = self.teammate_record(player_id, other_id)
+                    matrix[i][j] = (wins + prior_games / 2) / (games + prior_games) - 0.5
+        return matrix
+    
+    def partners(self, name, min_games=1):
+        """Teammate and opponent records of one player against everyone else"""
+        player_id = self.registry.id_for(name)
+        teammates, opponents = [], []
+        if player_id is None or player_id >= self._size:
+            return teammates, opponents
+        
+        for other_id in range(self.registry.capacity):
+            other = self.registry.name_for(other_id)
+            if other is None or other_id == player_id:
+                continue
+            games, wins = self.teammate_record(player_id, other_id)
+            if games >= min_games:
+                teammates.append({'name': other, 'games': games, 'wins': wins, 'win_rate': wins / games})
+            games, wins = self.opponent_record(player_id, other_id)
+            if games >= min_games:
+                opponents.append({'name': other, 'games': games, 'wins': wins, 'win_rate': wins / games})
+        
+        teammates.sort(key=lambda record: (-record['win_rate'], -record['games']))
+        opponents.sort(key=lambda record: (-record['win_rate'], -record['games']))
+        return teammates, opponents
+
+# Leaderboard configuration: the 'recent' window covers the group's last
+# LEADERBOARD_RECENT_GAMES games, win rate ranks players with enough games
+LEADERBOARD_RECENT_GAMES = int(os.getenv("LEADERBOARD_RECENT_GAMES", "20"))
+LEADERBOARD_MIN_GAMES = 3
+
+class Leaderboard:
+    """Per-player result counters with a sorted ranking for every metric.
+    
+    Each ranking is a list of (-value, player_id) keys kept sorted with
+    bisect, so a result update moves one key per metric and rank, top-N
+    and value-range queries are binary searches. Bulk loads accumulate()
+    the counters and then sort every ranking once with rank_all().
+    """
+    METRICS = ('games', 'wins', 'win_rate', 'points', 'goals', 'rating')
+    
+    def __init__(self):
+        self.counters = {}
+        self.rankings = {metric: [] for metric in self.METRICS}
+        self._keys = {}
+    
+    @staticmethod
+    def metric_value(metric, counters):
+        games, wins, draws, goals, rating_sum, rated = counters
+        if metric == 'games':
+            return games
+        if metric == 'wins':
+            return wins
+        if metric == 'points':
+            return 3 * wins + draws
+        if metric == 'goals':
+            return goals
+        if metric == 'rating':
+            return round(rating_sum / rated, 4) if rated else None
+        return wins / games if games >= LEADERBOARD_MIN_GAMES else None
+    
+    def accumulate(self, player_id, result, sign=1):
+        """Update a player's counters only; rankings are left for rank_all()"""
+        won, drew, goals, rating = result
+        counters = self.counters.setdefault(player_id, [0, 0, 0, 0, 0.0, 0])
+        counters[0] += sign
+        counters[1] += sign * won
+        counters[2] += sign * drew
+        counters[3] += sign * goals
+        if rating is not None:
+            counters[4] += sign * rating
+            counters[5] += sign
+        return counters
+    
+    def rank_all(self):
+        """Rebuild every ranking from the counters with one sort per metric"""
+        self._keys = {}
+        for metric in self.METRICS:
+            ranking = []
+            for player_id, counters in self.counters.items():
+                value = self.metric_value(metric, counters)
+                if value is not None:
+                    key = (-value, player_id)
+                    ranking.append(key)
+                    self._keys[(metric, player_id)] = key
+            ranking.sort()
+            self.rankings[metric] = ranking
+    
+    def apply(self, player_id, result, sign=1):
+        """Add (sign=1) or remove (sign=-1) one game result of a player.
+        
+        result is (won, drew, goals, rating) with rating None when unrated.
+        """
+        counters = self.accumulate(player_id, result, sign)
+        for metric, ranking in self.rankings.items():
+            old_key = self._keys.pop((metric, player_id), None)
+            if old_key is not None:
+                del ranking[bisect.bisect_left(ranking, old_key)]
+            value = self.metric_value(metric, counters) if counters[0] else None
+            if value is not None:
+                key = (-value, player_id)
+                bisect.insort(ranking, key)
+                self._keys[(metric, player_id)] = key
+        
+        if not counters[0]:
+            del self.counters[player_id]
+    
+    def size(self, metric):
+        return len(self.rankings[metric])
+    
+    def value(self, metric, player_id):
+        key = self._keys.get((metric, player_id))
+        return None if key is None else -key[0]
+    
+    def top(self, metric, limit, offset=0):
+        """(player_id, value) pairs ranked offset+1 .. offset+limit"""
+        return [(player_id, -key) for key, player_id in self.rankings[metric][offset:offset + limit]]
+    
+    def rank(self, metric, player_id):
+        """1-based competition rank (ties share a rank), or None if unranked"""
+        key = self._keys.get((metric, player_id))
+        if key is None:
+            return None
+        return bisect.bisect_left(self.rankings[metric], (key[0],)) + 1
+    
+    def value_range(self, metric, low=None, high=None):
+        """(player_id, value) pairs with low <= value <= high, best first"""
+        ranking = self.rankings[metric]
+        start = 0 if high is None else bisect.bisect_left(ranking, (-high,))
+        end = len(ranking) if low is None else bisect.bisect_right(ranking, (-low, float('inf')))
+        return [(player_id, -key) for key, player_id in ranking[start:end]]
+
+class LeaderboardIndex(GameIndex):
+    """Leaderboards over all games and over the group's most recent games"""
+    WINDOWS = ('all', 'recent')
+    
+    def clear(self):
+        self.boards = {window: Leaderboard() for window in self.WINDOWS}
+        self._recent = deque()
+    
+    @staticmethod
+    def game_results(registry, game):
+        """(player_id, (won, drew, goals, rating)) for every player of a game"""
+        score_a, score_b = game['team_a']['score'], game['team_b']['score']
+        events = game.get('events', {})
+        results = []
+        for team_key, won in (('team_a', score_a > score_b), ('team_b', score_b > score_a)):
+            for player in game[team_key]['players']:
+                goals, _, rating, _ = events.get(player['name'], (0, 0, None, False))
+                results.append((registry.intern(player['name']), (int(won), int(score_a == score_b), goals, rating)))
+        return results
+    
+    def add_game(self, position, game):
+        results = self.game_results(self.registry, game)
+        recent = self.boards['recent']
+        
+        self._recent.append(results)
+        if len(self._recent) > LEADERBOARD_RECENT_GAMES:
+            for player_id, result in self._recent.popleft():
+                recent.apply(player_id, result, sign=-1)
+        
+        for player_id, result in results:
+            self.boards['all'].apply(player_id, result)
+            recent.apply(player_id, result)
+    
+    def rebuild(self, games):
+        board = self.boards['all']
+        self._recent = deque(maxlen=LEADERBOARD_RECENT_GAMES)
+        for game in games:
+            results = self.game_results(self.registry, game)
+            self._recent.append(results)
+            for player_id, result in results:
+                board.accumulate(player_id, result)
+        
+        recent = self.boards['recent']
+        for results in self._recent:
+            for player_id, result in results:
+                recent.accumulate(player_id, result)
+        # add_game() retires games from the window itself, so drop the maxlen
+        self._recent = deque(self._recent)
+        for board in self.boards.values():
+            board.rank_all()
+    
+    def entry(self, window, metric, player_id, value):
+        board = self.boards[window]
+        games, wins, draws, goals = board.counters[player_id][:4]
+        return {
+            'rank': board.rank(metric, player_id),
+            'name': self.registry.name_for(player_id),
+            'value': value,
+            'games': games,
+            'wins': wins,
+            'draws': draws,
+            'goals': goals
+        }
+
+# Seasons start on the first day of SEASON_START_MONTH and are named after that year
+SEASON_START_MONTH = int(os.getenv("SEASON_START_MONTH", "1"))
+
+class GameDateIndex(GameIndex):
+    """Game positions ordered by date, for date-range and season queries.
+    
+    Keys are (date ordinal, position) kept sorted with bisect, so a range
+    query costs a binary search plus the games inside the range. Games
+    without a parsable date are left out.
+    """
+    def clear(self):
+        self._keys = []
+    
+    def add_game(self, position, game):
+        ordinal = GameArchive.date_ordinal(game.get('date', ''))
+        if ordinal:
+            bisect.insort(self._keys, (ordinal, position))
+    
+    def positions(self, start=None, end=None):
+        """Positions of the games dated start..end inclusive, oldest first"""
+        low = 0 if start is None else bisect.bisect_left(self._keys, (start.toordinal(),))
+        high = len(self._keys) if end is None else bisect.bisect_left(self._keys, (end.toordinal() + 1,))
+        return [position for _, position in self._keys[low:high]]
+
+def season_bounds(season):
+    """First and last day of a season"""
+    start = date(season, SEASON_START_MONTH, 1)
+    return start, date(season + 1, SEASON_START_MONTH, 1) - timedelta(days=1)
+
+def aggregate_games(games, positions, names=None):
+    """Per-player results over the games at the given positions, optionally only for some names"""
+    stats = {}
+    for position in positions:
+        game = games[position]
+        score_a, score_b = game['team_a']['score'], game['team_b']['score']
+        for team_key, scored, conceded in (('team_a', score_a, score_b), ('team_b', score_b, score_a)):
+            for player in game[team_key]['players']:
+                name = player['name']
+                if names is not None and name not in names:
+                    continue
+                row = stats.setdefault(name, {'games': 0, 'wins': 0, 'draws': 0, 'losses': 0, 'goals_for': 0, 'goals_against': 0})
+                row['games'] += 1
+                row['wins'] += scored > conceded
+                row['draws'] += scored == conceded
+                row['losses'] += scored < conceded
+                row['goals_for'] += scored
+                row['goals_against'] += conceded
+    
+    for row in stats.values():
+        row['win_rate'] = row['wins'] / row['games']
+    return stats
+
+# Elo ratings: every player starts at ELO_INITIAL and moves ELO_K points per
+# unit of surprise; a team's rating is its players' mean rating
+ELO_INITIAL = 1500.0
+ELO_K = float(os.getenv("ELO_K", "24"))
+ELO_SCALE = 400.0
+
+class EloIndex(GameIndex):
+    """Per-player Elo ratings fitted by replaying the recorded games in order.
+    
+    The ratings are the cached parameters of the outcome model. They are
+    updated incrementally as games are recorded and rebuilt only when the
+    history is rewritten. While replaying, the index scores its own
+    pre-game predictions so their quality can be reported.
+    """
+    def clear(self):
+        self._ratings = []
+        self.predicted_games = 0
+        self.correct_predictions = 0
+        self.brier_total = 0.0
+    
+    @staticmethod
+    def win_probability(ratings_a, ratings_b):
+        """Expected score of team A (win 1, draw 0.5) against team B"""
+        if not ratings_a or not ratings_b:
+            return 0.5
+        difference = sum(ratings_b) / len(ratings_b) - sum(ratings_a) / len(ratings_a)
+        return 1.0 / (1.0 + 10.0 ** (difference / ELO_SCALE))
+    
+    def _rating(self, player_id):
+        return self._ratings[player_id] if player_id < len(self._ratings) else ELO_INITIAL
+    
+    def add_game(self, position, game):
+        ids_a = [self.registry.intern(player['name']) for player in game['team_a']['players']]
+        ids_b = [self.registry.intern(player['name']) for player in game['team_b']['players']]
+        if not ids_a or not ids_b:
+            return
+        
+        if self.registry.capacity > len(self._ratings):
+            self._ratings.extend([ELO_INITIAL] * (self.registry.capacity - len(self._ratings)))
+        
+        expected = self.win_probability([self._rating(i) for i in ids_a], [self._rating(i) for i in ids_b])
+        score_a, score_b = game['team_a']['score'], game['team_b']['score']
+        result = 1.0 if score_a > score_b else 0.0 if score_a < score_b else 0.5
+        
+        self.predicted_games += 1
+        self.brier_total += (expected - result) ** 2
+        if result != 0.5 and (expected > 0.5) == (result == 1.0):
+            self.correct_predictions += 1
+        
+        delta = ELO_K * (result - expected)
+        for player_id in ids_a:
+            self._ratings[player_id] += delta
+        for player_id in ids_b:
+            self._ratings[player_id] -= delta
+    
+    def rating(self, name):
+        player_id = self.registry.id_for(name)
+        return ELO_INITIAL if player_id is None else self._rating(player_id)
+    
+    def ratings(self, names):
+        return [self.rating(name) for name in names]
+    
+    def predict(self, names_a, names_b):
+        return self.win_probability(self.ratings(names_a), self.ratings(names_b))
+    
+    def quality(self):
+        """How well the ratings predicted each game before it was played"""
+        games = self.predicted_games
+        return {
+            'games': games,
+            'k_factor': ELO_K,
+            'brier_score': self.brier_total / games if games else None,
+            'accuracy': self.correct_predictions / games if games else None
+        }
+
+# Rotation: how many of the group's latest games count as "recent" when
+# discouraging the same players from being teamed up again
+ROTATION_RECENT_GAMES = int(os.getenv("ROTATION_RECENT_GAMES", "8"))
+
+class RotationIndex(GameIndex):
+    """How often each pair of players were teammates in the group's latest games.
+    
+    Pair counts cover a sliding window of ROTATION_RECENT_GAMES games: each
+    recorded game adds its teammate pairs and retires the pairs of the game
+    that drops out of the window.
+    """
+    def clear(self):
+        self._pairs = {}
+        self._recent = deque()
+    
+    def _apply(self, teams, sign):
+        for ids in teams:
+            for k, player_id in enumerate(ids):
+                for other_id in ids[k + 1:]:
+                    pair = (min(player_id, other_id), max(player_id, other_id))
+                    count = self._pairs.get(pair, 0) + sign
+                    if count:
+                        self._pairs[pair] = count
+                    else:
+                        del self._pairs[pair]
+    
+    def add_game(self, position, game):
+        teams = [
+            [self.registry.intern(player['name']) for player in game[team_key]['players']]
+            for team_key in ('team_a', 'team_b')
+        ]
+        self._recent.append(teams)
+        self._apply(teams, 1)
+        if len(self._recent) > ROTATION_RECENT_GAMES:
+            self._apply(self._recent.popleft(), -1)
+    
+    def rebuild(self, games):
+        # Only the games still inside the window contribute
+        start = max(len(games) - ROTATION_RECENT_GAMES, 0)
+        for position in range(start, len(games)):
+            self.add_game(position, games[position])
+    
+    def matrix(self, names):
+        """Square matrix of recent teammate counts for a squad, in squad order"""
+        ids = [self.registry.id_for(name) for name in names]
+        matrix = [[0.0] * len(names) for _ in names]
+        for i, player_id in enumerate(ids):
+            for j in range(i + 1, len(ids)):
+                other_id = ids[j]
+                if player_id is not None and other_id is not None:
+                    matrix[i][j] = matrix[j][i] = float(self._pairs.get((min(player_id, other_id), max(player_id, other_id)), 0))
+        return matrix
+
+def rename_player(data, old_name, new_name):
+    """Rename a player everywhere in the dataset, keeping their ID"""
+    data['players'] = {
+        (new_name if name == old_name else name): stats
+        for name, stats in data['players'].items()
+    }
+    for player in data.get('current_players', []):
+        if player.get('name') == old_name:
+            player['name'] = new_name
+    games = data.get('games', [])
+    for position, game in enumerate(games):
+        played = any(
+            player.get('name') == old_name
+            for team_key in ('team_a', 'team_b') for player in game[team_key]['players']
+        )
+        if not played and old_name not in game.get('events', {}):
+            continue
+        # Game records may be shared with the cached dataset
+        game = games[position] = copy.deepcopy(game)
+        for team_key in ('team_a', 'team_b'):
+            for player in game[team_key]['players']:
+                if player.get('name') == old_name:
+                    player['name'] = new_name
+        if old_name in game.get('events', {}):
+            game['events'][new_name] = game['events'].pop(old_name)
+
+# Per-player match events are stored compactly on the game as
+# {name: [goals, assists, rating, mvp]}, with rating None when not given
+EVENT_FIELDS = ('goals', 'assists', 'rating', 'mvp')
+MAX_RATING = 10
+
+def compact_events(events):
+    """Turn a list of {'player', 'goals', 'assists', 'rating', 'mvp'} dicts into the stored form"""
+    compact = {}
+    for event in events or []:
+        if not isinstance(event, dict) or not isinstance(event.get('player'), str):
+            raise ValueError('events entries need a player')
+        if event['player'] in compact:
+            raise ValueError(f"more than one events entry for {event['player']}")
+        compact[event['player']] = [
+            event.get('goals', 0),
+            event.get('assists', 0),
+            event.get('rating'),
+            bool(event.get('mvp', False))
+        ]
+    return compact
+
+def normalize_events(game):
+    """Convert a game's list-form events to the stored form in place"""
+    if isinstance(game, dict) and isinstance(game.get('events'), list):
+        game['events'] = compact_events(game['events'])
+    return game
+
+def validate_events(game):
+    """Check a game's stored events against its line-ups, returning a list of errors"""
+    events = game.get('events', {})
+    if not isinstance(events, dict):
+        return ['events must be an object']
+    
+    names = {player.get('name') for team_key in ('team_a', 'team_b') for player in game[team_key]['players']}
+    errors = []
+    for name, values in events.items():
+        if name not in names:
+            errors.append(f'events for {name} who did not play')
+            continue
+        if not isinstance(values, list) or len(values) != len(EVENT_FIELDS):
+            errors.append(f'events for {name} must be [goals, assists, rating, mvp]')
+            continue
+        goals, assists, rating, mvp = values
+        for field, count in (('goals', goals), ('assists', assists)):
+            if not isinstance(count, int) or isinstance(count, bool) or count < 0:
+                errors.append(f'{field} for {name} must be a non-negative integer')
+        if rating is not None and (not isinstance(rating, (int, float)) or isinstance(rating, bool) or not 0 <= rating <= MAX_RATING):
+            errors.append(f'rating for {name} must be between 0 and {MAX_RATING}')
+        if not isinstance(mvp, bool):
+            errors.append(f'mvp for {name} must be a boolean')
+    return errors
+
+def apply_game_to_players(players, game):
+    """Update the aggregated player stats with the result and events of one game.
+    
+    Goals, assists and MVP awards are running sums; average_rating is a
+    running mean over the games in which the player was rated.
+    """
+    team_a_won = game['team_a']['score'] > game['team_b']['score']
+    team_b_won = game['team_b']['score'] > game['team_a']['score']
+    
+    for team_key, won in (('team_a', team_a_won), ('team_b', team_b_won)):
+        for player in game[team_key]['players']:
+            name = player['name']
+            if name not in players:
+                players[name] = new_player_stats(
+                    player.get('position', 'unknown'),
+                    player.get('skill_level', 5)
+                )
+            
+            players[name]['games_played'] += 1
+            if won:
+                players[name]['wins'] += 1
+            players[name]['last_played'] = game['date']
+    
+    for name, (goals, assists, rating, mvp) in game.get('events', {}).items():
+        stats = players[name]
+        stats['total_goals'] += goals
+        stats['assists'] = stats.get('assists', 0) + assists
+        stats['mvp_awards'] = stats.get('mvp_awards', 0) + mvp
+        if rating is not None:
+            rated_games = stats.get('rated_games', 0) + 1
+            stats['average_rating'] = round(stats['average_rating'] + (rating - stats['average_rating']) / rated_games, 4)
+            stats['rated_games'] = rated_games
+
+def validate_game(game):
+    """Validate a game record against the storage schema, returning a list of errors"""
+    if not isinstance(game, dict):
+        return ['game must be an object']
+    
+    errors = []
+    if game.get('id') in (None, ''):
+        errors.append('missing id')
+    if not isinstance(game.get('date'), str):
+        errors.append('date must be a string')
+    
+    for team_key in ('team_a', 'team_b'):
+        team = game.get(team_key)
+        if not isinstance(team, dict):
+            errors.append(f'{team_key} must be an object')
+            continue
+        score = team.get('score')
+        if not isinstance(score, int) or isinstance(score, bool) or score < 0:
+            errors.append(f'{team_key}.score must be a non-negative integer')
+        players = team.get('players')
+        if not isinstance(players, list):
+            errors.append(f'{team_key}.players must be a list')
+            continue
+        for player in players:
+            if not isinstance(player, dict) or not isinstance(player.get('name'), str) or not player['name'].strip():
+                errors.append(f'{team_key}.players entries need a name')
+                break
+    
+    if not errors:
+        errors.extend(validate_events(game))
+    return errors
+
+def import_games_stream(lines, all_data, resume_from=0, batch_size=IMPORT_BATCH_SIZE, group=None):
+    """Import NDJSON game records into all_data, committing in bounded batches.
+    
+    Each batch is appended to the store's import journal, with the
+    checkpoint in .meta, instead of rewriting the whole dataset; the data
+    file itself is written once, when the stream is complete. Records
+    before resume_from are skipped without being parsed, so a failed
+    import can be resumed from the checkpoint returned by the previous
+    attempt, after replaying the games that attempt journaled.
+    """
+    store = tenants.get(group or current_group()).store
+    known_ids = {game.get('id') for game in all_data['games']}
+    replayed = 0
+    if resume_from:
+        for game in store.read_journal():
+            if game.get('id') not in known_ids:
+                known_ids.add(game.get('id'))
+                all_data['games'].append(game)
+                apply_game_to_players(all_data['players'], game)
+                replayed += 1
+    else:
+        store.clear_journal()
+    
+    report = {
+        'imported': 0,
+        'duplicates': 0,
+        'invalid': 0,
+        'errors': [],
+        'checkpoint': resume_from,
+        'complete': False
+    }
+    batch = []
+    position = 0
+    
+    def commit():
+        if not batch:
+            return True
+        try:
+            store.append_journal(batch, position)
+        except OSError as e:
+            logger.error(f"Error journaling import batch: {e}")
+            return False
+        report['imported'] += len(batch)
+        report['checkpoint'] = position
+        logger.info(f"📥 Import batch journaled: {report['imported']} games imported, checkpoint {position}")
+        batch.clear()
+        return True
+    
+    for raw in lines:
+        if position < resume_from:
+            position += 1
+            continue
+        position += 1
+        
+        line = raw.decode('utf-8') if isinstance(raw, bytes) else raw
+        if not line.strip():
+            continue
+        
+        try:
+            game = json.loads(line)
+        except ValueError as e:
+            errors = [f'invalid JSON: {e}']
+        else:
+            try:
+                errors = validate_game(normalize_events(game))
+            except ValueError as e:
+                errors = [str(e)]
+        
+        if errors:
+            report['invalid'] += 1
+            if len(report['errors']) < IMPORT_MAX_REPORTED_ERRORS:
+                report['errors'].append({'record': position, 'errors': errors})
+            continue
+        
+        if game['id'] in known_ids:
+            report['duplicates'] += 1
+            continue
+        
+        known_ids.add(game['id'])
+        all_data['games'].append(game)
+        apply_game_to_players(all_data['players'], game)
+        batch.append(game)
+        
+        if len(batch) >= batch_size and not commit():
+            return report
+    
+    if not commit():
+        return report
+    
+    if (report['imported'] or replayed) and not save_data(all_data, group, games_appended=True):
+        return report
+    store.clear_journal()
+    
+    report['checkpoint'] = position
+    report['complete'] = True
+    return report
+
+# Export configuration
+EXPORT_FLUSH_BYTES = 64 * 1024
+EXPORT_GAME_COLUMNS = ['id', 'date', 'team_a_score', 'team_b_score', 'location', 'notes', 'team_a_players', 'team_b_players', 'events']
+EXPORT_PLAYER_COLUMNS = ['name', 'games_played', 'wins', 'total_goals', 'average_rating', 'last_played', 'position', 'skill_level', 'assists', 'mvp_awards']
+
+def export_rows(kind, data):
+    """Yield flat CSV rows (header first) for games or players"""
+    if kind == 'games':
+        yield EXPORT_GAME_COLUMNS
+        for game in data.get('games', []):
+            yield [
+                game.get('id', ''),
+                game.get('date', ''),
+                game['team_a']['score'],
+                game['team_b']['score'],
+                game.get('location', ''),
+                game.get('notes', ''),
+                ';'.join(p['name'] for p in game['team_a']['players']),
+                ';'.join(p['name'] for p in game['team_b']['players']),
+                json.dumps(game['events'], separators=(',', ':')) if game.get('events') else ''
+            ]
+    else:
+        yield EXPORT_PLAYER_COLUMNS
+        for name, stats in data.get('players', {}).items():
+            yield [name] + [stats.get(column, '') for column in EXPORT_PLAYER_COLUMNS[1:]]
+
+def export_records(kind, data):
+    """Yield one JSON-serialisable record per game or player"""
+    if kind == 'games':
+        yield from data.get('games', [])
+    else:
+        for name, stats in data.get('players', {}).items():
+            yield {'name': name, **stats}
+
+def stream_export(kind, data, fmt='ndjson'):
+    """Serialise an export one record at a time, yielding text chunks"""
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        for row in export_rows(kind, data):
+            writer.writerow(row)
+            if buffer.tell() >= EXPORT_FLUSH_BYTES:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    else:
+        for record in export_records(kind, data):
+            buffer.write(json.dumps(record, separators=(',', ':')))
+            buffer.write('\n')
+            if buffer.tell() >= EXPORT_FLUSH_BYTES:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def gzip_chunks(chunks):
+    """Compress a stream of text chunks incrementally into a gzip stream"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode('utf-8'))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+class GameArchive:
+    """Compact columnar, memory-mappable archive of the game history.
+    
+    Layout (little-endian): a fixed header, a section table of
+    (offset, length) pairs, then one section per column. Player names are
+    stored once in a dictionary and rosters are flat arrays of integer
+    player IDs addressed through per-game offset arrays, so scans never
+    have to build per-game dicts or parse roster JSON.
+    """
+    MAGIC = b'FBA1'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHHIII')
+    SECTIONS = ['names', 'game_ids', 'score_a', 'score_b', 'date',
+                'roster_a_offsets', 'roster_b_offsets', 'roster_a', 'roster_b']
+    SECTION_ENTRY = struct.Struct('<QQ')
+    TYPECODES = {
+        'score_a': 'i', 'score_b': 'i', 'date': 'i',
+        'roster_a_offsets': 'I', 'roster_b_offsets': 'I',
+        'roster_a': 'I', 'roster_b': 'I'
+    }
+    
+    def __init__(self, path):
+        if sys.byteorder != 'little':
+            raise RuntimeError("GameArchive can only be memory-mapped on little-endian hosts")
+        
+        self._file = open(path, 'rb')
+        self._columns = {}
+        self._view = None
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        view = self._view = memoryview(self._map)
+        
+        magic, version, _, n_games, n_players, _ = self.HEADER.unpack_from(view, 0) if len(view) >= self.HEADER.size else (None,) * 6
+        if magic != self.MAGIC or version != self.VERSION:
+            self.close()
+            raise ValueError(f"Not a game archive (version {self.VERSION}): {path}")
+        
+        self.n_games = n_games
+        self.n_players = n_players
+        table_offset = self.HEADER.size
+        for index, name in enumerate(self.SECTIONS):
+            offset, length = self.SECTION_ENTRY.unpack_from(view, table_offset + index * self.SECTION_ENTRY.size)
+            section = view[offset:offset + length]
+            if name in self.TYPECODES:
+                section = section.cast(self.TYPECODES[name])
+            self._columns[name] = section
+        
+        self.names = bytes(self._columns['names']).decode('utf-8').split('\0') if n_players else []
+        self.score_a = self._columns['score_a']
+        self.score_b = self._columns['score_b']
+        self.date = self._columns['date']
+        self._game_ids = None
+    
+    def __len__(self):
+        return self.n_games
+    
+    def close(self):
+        """Release the column views and unmap the archive.
+        
+        Views returned by roster() borrow the mapping too: callers must drop
+        (or release()) them first, or unmapping fails with BufferError.
+        """
+        try:
+            for section in self._columns.values():
+                section.release()
+            self._columns.clear()
+            self.score_a = self.score_b = self.date = None
+            if self._view is not None:
+                self._view.release()
+                self._view = None
+            self._map.close()
+        finally:
+            self._file.close()
+    
+    def roster(self, game_index, team='a'):
+        """Return the player IDs of one team as a zero-copy memoryview.
+        
+        The view borrows the archive's mapping; drop it before close().
+        """
+        offsets = self._columns[f'roster_{team}_offsets']
+        return self._columns[f'roster_{team}'][offsets[game_index]:offsets[game_index + 1]]
+    
+    def game_id(self, game_index):
+        if self._game_ids is None:
+            self._game_ids = bytes(self._columns['game_ids']).decode('utf-8').split('\0')
+        return self._game_ids[game_index]
+    
+    def player_totals(self):
+        """Scan the archive once and return per-player (games, wins) arrays indexed by player ID"""
+        games = array('I', bytes(4 * self.n_players))
+        wins = array('I', bytes(4 * self.n_players))
+        for team, other in (('a', 'b'), ('b', 'a')):
+            offsets = self._columns[f'roster_{team}_offsets']
+            ids = self._columns[f'roster_{team}']
+            scores = self._columns[f'score_{team}']
+            other_scores = self._columns[f'score_{other}']
+            for game_index in range(self.n_games):
+                won = scores[game_index] > other_scores[game_index]
+                for k in range(offsets[game_index], offsets[game_index + 1]):
+                    player_id = ids[k]
+                    games[player_id] += 1
+                    if won:
+                        wins[player_id] += 1
+        return games, wins
+    
+    @staticmethod
+    def date_ordinal(value):
+        """Encode an ISO date string as a proleptic ordinal, 0 when unparsable"""
+        try:
+            return date.fromisoformat(str(value)[:10]).toordinal()
+        except ValueError:
+            return 0
+    
+    @classmethod
+    def build(cls, games, registry=None):
+        """Encode a list of games into archive bytes.
+        
+        When a PlayerRegistry is given, roster IDs in the archive are the
+        registry's player IDs.
+        """
+        registry = registry or PlayerRegistry()
+        columns = {name: array(code) for name, code in cls.TYPECODES.items()}
+        columns['roster_a_offsets'].append(0)
+        columns['roster_b_offsets'].append(0)
+        game_ids = []
+        
+        for game in games:
+            game_ids.append(str(game.get('id', '')))
+            columns['score_a'].append(int(game['team_a']['score']))
+            columns['score_b'].append(int(game['team_b']['score']))
+            columns['date'].append(cls.date_ordinal(game.get('date', '')))
+            for team in ('a', 'b'):
+                roster = columns[f'roster_{team}']
+                for player in game[f'team_{team}']['players']:
+                    roster.append(registry.intern(player['name']))
+                columns[f'roster_{team}_offsets'].append(len(roster))
+        
+        names = registry.names()
+        sections = {
+            'names': '\0'.join(name or '' for name in names).encode('utf-8'),
+            'game_ids': '\0'.join(game_ids).encode('utf-8')
+        }
+        for name, column in columns.items():
+            if sys.byteorder != 'little':
+                column.byteswap()
+            sections[name] = column.tobytes()
+        
+        table_size = cls.SECTION_ENTRY.size * len(cls.SECTIONS)
+        offset = cls.HEADER.size + table_size
+        table = b''
+        body = b''
+        for name in cls.SECTIONS:
+            padding = -offset % 8
+            body += b'\0' * padding
+            offset += padding
+            table += cls.SECTION_ENTRY.pack(offset, len(sections[name]))
+            body += sections[name]
+            offset += len(sections[name])
+        
+        header = cls.HEADER.pack(cls.MAGIC, cls.VERSION, 0, len(game_ids), len(names), len(columns['roster_a']) + len(columns['roster_b']))
+        return header + table + body
+    
+    @classmethod
+    def write(cls, path, games, registry=None):
+        """Write games to an archive file atomically"""
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(cls.build(games, registry))
+        os.replace(tmp_path, path)
+
+class Player:
+    def __init__(self, name, position, skill_level=5):
+        self.name = name
+        self.position = position
+        self.skill_level = skill_level
+    
+    def __repr__(self):
+        return f"{self.name} ({self.position}, lvl:{self.skill_level})"
+
+# Scoring model configuration
+SCORING_MODELS_PATH = os.getenv("SCORING_MODELS_PATH", "scoring_models.json")
+SCORING_RELOAD_INTERVAL = 5.0
+MAX_TEAM_SIZE = 32
+
+# Balancing configuration
+MAX_ALTERNATIVES = 10
+BALANCE_TIMEOUT = float(os.getenv("BALANCE_TIMEOUT", "2.0"))
+# A warm pool round trip costs 1-6ms, while an in-process search costs ~8ms
+# plain and ~20ms with history terms at 30 players, so splitting the
+# iterations over two or more cores starts paying off around there
+PARALLEL_MIN_PLAYERS = int(os.getenv("PARALLEL_MIN_PLAYERS", "30"))
+PARALLEL_WORKERS = int(os.getenv("PARALLEL_WORKERS", str(os.cpu_count() or 1)))
+PARALLEL_GRACE = 0.25
+
+class ConstraintError(ValueError):
+    """Raised when team constraints contradict each other or cannot be met"""
+
+class SplitPlan:
+    """Generates random team splits that satisfy pairing constraints.
+    
+    Players that must stay together are merged into units, and units that
+    must be kept apart form components that can only be placed in one of
+    two orientations (or one, if a member is pinned to a team). A subset-sum
+    table over the components is built up front, so contradictory or
+    unsatisfiable constraints are rejected immediately and random_split()
+    only ever draws feasible splits. Players that are unconstrained are
+    marked movable and can be swapped freely by the search.
+    """
+    def __init__(self, n, together=(), apart=(), pins=None):
+        self.n = n
+        pins = pins or {}
+        self.unconstrained = not (together or apart or pins)
+        self.movable = [True] * n
+        self.targets = sorted({n // 2, n - n // 2})
+        if self.unconstrained:
+            return
+        
+        # Merge must-together players into units
+        parent = list(range(n))
+        
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+        
+        for i, j in together:
+            parent[find(i)] = find(j)
+        
+        units = {}
+        for i in range(n):
+            units.setdefault(find(i), []).append(i)
+        unit_pin = {}
+        for i, team in pins.items():
+            root = find(i)
+            if unit_pin.setdefault(root, team) != team:
+                raise ConstraintError("Players that must play together are pinned to different teams")
+        
+        # Must-apart edges between units
+        edges = {root: set() for root in units}
+        for i, j in apart:
+            ri, rj = find(i), find(j)
+            if ri == rj:
+                raise ConstraintError("Players that must play together are also required to be apart")
+            edges[ri].add(rj)
+            edges[rj].add(ri)
+        
+        # Two-colour each component of the apart graph
+        self.components = []
+        colour = {}
+        for start in units:
+            if start in colour:
+                continue
+            colour[start] = 0
+            sides = ([], [])
+            forced = None
+            stack = [start]
+            while stack:
+                root = stack.pop()
+                sides[colour[root]].extend(units[root])
+                if root in unit_pin:
+                    orientation = colour[root] ^ unit_pin[root]
+                    if forced is not None and forced != orientation:
+                        raise ConstraintError("Pinned players conflict with keep-apart constraints")
+                    forced = orientation
+                for other in edges[root]:
+                    if other not in colour:
+                        colour[other] = 1 - colour[root]
+                        stack.append(other)
+                    elif colour[other] == colour[root]:
+                        raise ConstraintError("Keep-apart constraints cannot all be satisfied with two teams")
+            
+            if len(sides[0]) + len(sides[1]) > 1 or forced is not None:
+                for i in sides[0] + sides[1]:
+                    self.movable[i] = False
+            self.components.append((sides, forced))
+        
+        # reachable[k] is a bitset of team A sizes achievable by components k..end
+        self.reachable = [0] * (len(self.components) + 1)
+        self.reachable[-1] = 1
+        for k in range(len(self.components) - 1, -1, -1):
+            bits = 0
+            for orientation in self._orientations(k):
+                bits |= self.reachable[k + 1] << len(self.components[k][0][orientation])
+            self.reachable[k] = bits
+        
+        self.targets = [t for t in self.targets if self.reachable[0] >> t & 1]
+        if not self.targets:
+            raise ConstraintError(f"No split of {n} players satisfies the constraints")
+    
+    def _orientations(self, k):
+        forced = self.components[k][1]
+        return (0, 1) if forced is None else (forced,)
+    
+    def random_split(self, order):
+        """Fill order in place with a random feasible split.
+        
+        Team A is order[:size_a] and team B the rest; returns size_a.
+        """
+        if self.unconstrained:
+            random.shuffle(order)
+            return self.n // 2
+        
+        size_a = remaining = random.choice(self.targets)
+        front, back = 0, self.n
+        for k, (sides, _) in enumerate(self.components):
+            options = [
+                o for o in self._orientations(k)
+                if remaining >= len(sides[o]) and self.reachable[k + 1] >> (remaining - len(sides[o])) & 1
+            ]
+            orientation = random.choice(options)
+            for i in sides[orientation]:
+                order[front] = i
+                front += 1
+            for i in sides[1 - orientation]:
+                back -= 1
+                order[back] = i
+            remaining -= len(sides[orientation])
+        return size_a
+    
+    @classmethod
+    def from_names(cls, names, constraints):
+        """Build a plan from a /balance-teams constraints payload.
+        
+        constraints may contain 'together' and 'apart' lists of name pairs
+        (or larger groups for 'together') and 'pins' mapping a name to
+        'team_a' or 'team_b'.
+        """
+        constraints = constraints or {}
+        index = {name: i for i, name in enumerate(names)}
+        
+        def lookup(name):
+            if name not in index:
+                raise ConstraintError(f"Constraint refers to a player who is not in the squad: {name}")
+            return index[name]
+        
+        together = []
+        for group in constraints.get('together', []):
+            members = [lookup(name) for name in group]
+            together.extend(zip(members, members[1:]))
+        apart = [(lookup(a), lookup(b)) for a, b in constraints.get('apart', [])]
+        
+        pins = {}
+        for name, team in constraints.get('pins', {}).items():
+            if team not in ('a', 'b', 'team_a', 'team_b'):
+                raise ConstraintError(f"Unknown team for {name}: {team}")
+            pins[lookup(name)] = 0 if team in ('a', 'team_a') else 1
+        
+        return cls(len(names), together, apart, pins)
+
+class ScoringModel:
+    """A team-strength scoring model compiled into lookup tables.
+    
+    Positions are mapped to integer codes with a per-code weight, and every
+    position bonus group gets a table indexed by the number of the team's
+    players in that group. Team strength is then
+    sum(skill * weights[code]) + sum(tables[group][count]) with no
+    per-position branching; unknown positions score with default_weight
+    and no bonus.
+    """
+    def __init__(self, name, config):
+        self.name = name
+        self.config = config
+        self._codes = {position: code for code, position in enumerate(config['position_weights'])}
+        unknown = len(self._codes)
+        self.weights = [float(w) for w in config['position_weights'].values()] + [float(config.get('default_weight', 1.0))]
+        
+        self.group_of = [None] * (unknown + 1)
+        self._bonuses = []
+        for bonus in config.get('bonuses', []):
+            group = len(self._bonuses)
+            for position in bonus['positions']:
+                if position not in self._codes:
+                    raise ValueError(f"Scoring model '{name}': bonus for unknown position {position}")
+                if self.group_of[self._codes[position]] is not None:
+                    raise ValueError(f"Scoring model '{name}': {position} is in more than one bonus group")
+                self.group_of[self._codes[position]] = group
+            tiers = sorted((int(threshold), float(value)) for threshold, value in bonus.get('tiers', {}).items())
+            self._bonuses.append((tiers, float(bonus.get('per_player', 0))))
+        
+        # Positions without a bonus share a final all-zero group
+        ungrouped = len(self._bonuses)
+        self._bonuses.append(([], 0.0))
+        self.group_of = [ungrouped if group is None else group for group in self.group_of]
+        self.tables = [[] for _ in self._bonuses]
+        self.ensure_capacity(MAX_TEAM_SIZE)
+    
+    def ensure_capacity(self, size):
+        """Extend the bonus tables to cover counts up to size"""
+        for table, (tiers, per_player) in zip(self.tables, self._bonuses):
+            for count in range(len(table), size + 1):
+                tier_bonus = 0.0
+                for threshold, value in tiers:
+                    if count >= threshold:
+                        tier_bonus = value
+                table.append(tier_bonus + per_player * count)
+    
+    def code(self, position):
+        return self._codes.get(position, len(self._codes))
+    
+    def team_strength(self, codes, skills):
+        self.ensure_capacity(len(codes))
+        counts = [0] * len(self.tables)
+        strength = 0.0
+        for code, skill in zip(codes, skills):
+            strength += skill * self.weights[code]
+            counts[self.group_of[code]] += 1
+        return strength + sum(table[count] for table, count in zip(self.tables, counts))
+
+class ScoringModelRegistry:
+    """Named scoring models loaded from a JSON config file.
+    
+    The file maps model names (per league or venue) to scoring configs,
+    plus an optional 'default' name. It is re-read when its modification
+    time changes, checked at most every SCORING_RELOAD_INTERVAL seconds, so
+    models can be updated without restarting workers. A config that fails
+    to compile is logged and the previous models stay active.
+    """
+    def __init__(self, path, builtin):
+        self.path = path
+        self._builtin = ScoringModel('builtin', builtin)
+        self._models = {}
+        self._default = 'builtin'
+        self._mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+    
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked < SCORING_RELOAD_INTERVAL:
+            return
+        
+        with self._lock:
+            self._checked = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                mtime = None
+            if mtime == self._mtime:
+                return
+            self._mtime = mtime
             
-            logger.info(f"✅ Saved data to Google Sheets: {len(data['games'])} games, {len(data['players'])} players")
-            return True
+            if mtime is None:
+                self._models, self._default = {}, 'builtin'
+                return
             
-        except Exception as e:
-            logger.error(f"Error saving to Google Sheets: {e}")
-            return False
+            try:
+                with open(self.path, 'r') as f:
+                    config = json.load(f)
+                models = {name: ScoringModel(name, model) for name, model in config.get('models', {}).items()}
+                default = config.get('default', 'builtin')
+                if default != 'builtin' and default not in models:
+                    raise ValueError(f"default model '{default}' is not defined")
+                self._models, self._default = models, default
+                logger.info(f"✅ Loaded scoring models from {self.path}: {sorted(models)}")
+            except Exception as e:
+                logger.error(f"❌ Failed to load scoring models from {self.path}: {e}")
     
-    def get_default_data(self):
-        """Return default data structure"""
-        return {
-            'players': {},
-            'games': [],
-            'current_players': []
-        }
+    def names(self):
+        self._maybe_reload()
+        return ['builtin'] + sorted(self._models)
+    
+    @property
+    def default_name(self):
+        self._maybe_reload()
+        return self._default
+    
+    def get(self, name=None):
+        """Return a compiled model by name (the default when None), or None if unknown"""
+        self._maybe_reload()
+        name = name or self._default
+        if name == 'builtin':
+            return self._builtin
+        return self._models.get(name)
 
-# Initialize Google Sheets manager
-sheets_manager = GoogleSheetsManager()
+class Squad:
+    """Compact, array-backed squad used by the balancing search.
+    
+    Players are addressed by their index in the squad; skills are stored
+    in a typed array and names/positions are only needed to build the
+    response.
+    """
+    __slots__ = ('names', 'positions', 'skills')
+    
+    def __init__(self, names, positions, skills):
+        self.names = names
+        self.positions = positions
+        self.skills = array('d', skills)
+    
+    def __len__(self):
+        return len(self.names)
+    
+    @classmethod
+    def from_payload(cls, players_data):
+        """Build a squad from the players list of a request body"""
+        return cls(
+            [p['name'] for p in players_data],
+            [p['position'] for p in players_data],
+            [p['skill_level'] for p in players_data]
+        )
+    
+    @classmethod
+    def from_players(cls, players):
+        return cls([p.name for p in players], [p.position for p in players], [p.skill_level for p in players])
+    
+    def encode(self, model):
+        """Per-player weighted skill values and bonus-group codes under a scoring model"""
+        model.ensure_capacity(len(self))
+        codes = [model.code(position) for position in self.positions]
+        values = array('d', (skill * model.weights[code] for skill, code in zip(self.skills, codes)))
+        groups = array('i', (model.group_of[code] for code in codes))
+        return values, groups
+    
+    def strength(self, indices, model):
+        """Team strength of the given squad indices"""
+        if not indices:
+            return 0
+        return model.team_strength([model.code(self.positions[i]) for i in indices], [self.skills[i] for i in indices])
+    
+    def skill_level(self, i):
+        skill = self.skills[i]
+        return int(skill) if skill.is_integer() else skill
+    
+    def to_dicts(self, indices):
+        return [
+            {'name': self.names[i], 'position': self.positions[i], 'skill_level': self.skill_level(i)}
+            for i in indices
+        ]
 
-# Fallback to simple file storage
-def load_data():
-    """Load data with Google Sheets primary, file fallback"""
-    # Try Google Sheets first
-    sheets_data = sheets_manager.load_data()
-    if sheets_manager.sheet:
-        logger.info("✓ Using Google Sheets storage")
-        return sheets_data
+class SearchTerms:
+    """History-based terms of the balancing objective, on top of strength.
     
-    # Fallback to file storage
-    try:
-        if os.path.exists('football_data.json'):
-            with open('football_data.json', 'r') as f:
-                data = json.load(f)
-                logger.info("✓ Using file storage fallback")
-                return data
-    except Exception as e:
-        logger.error(f"Error loading fallback data: {e}")
-    
-    logger.info("✓ Using default data structure")
-    return sheets_manager.get_default_data()
-
-def save_data(data):
-    """Save data with Google Sheets primary, file fallback"""
-    # Try Google Sheets first
-    if sheets_manager.sheet:
-        success = sheets_manager.save_data(data)
-        if success:
-            logger.info("✓ Data saved to Google Sheets")
-            return True
+    pair_weights is a square matrix of historical teammate synergy over
+    the squad, ratings the Elo rating per squad index and repeat_counts a
+    square matrix of recent teammate counts; each term only counts when
+    both its data and a positive weight are given. Arguments are
+    keyword-only so terms cannot be swapped by position.
+    """
+    __slots__ = ('pair_weights', 'synergy_weight', 'ratings', 'prediction_weight', 'repeat_counts', 'rotation_weight')
     
-    # Fallback to file storage
-    logger.warning("Google Sheets save failed, using file storage fallback")
-    try:
-        with open('football_data.json', 'w') as f:
-            json.dump(data, f, indent=2)
-        logger.info("✓ Data saved to local file")
-        return True
-    except Exception as e:
-        logger.error(f"Fallback save also failed: {e}")
-        return False
+    def __init__(self, *, pair_weights=None, synergy_weight=0.0, ratings=None, prediction_weight=0.0,
+                 repeat_counts=None, rotation_weight=0.0):
+        self.pair_weights = pair_weights
+        self.synergy_weight = synergy_weight
+        self.ratings = ratings
+        self.prediction_weight = prediction_weight
+        self.repeat_counts = repeat_counts
+        self.rotation_weight = rotation_weight
+    
+    @property
+    def use_synergy(self):
+        return self.pair_weights is not None and self.synergy_weight > 0
+    
+    @property
+    def use_prediction(self):
+        return self.ratings is not None and self.prediction_weight > 0
+    
+    @property
+    def use_rotation(self):
+        return self.repeat_counts is not None and self.rotation_weight > 0
 
-class Player:
-    def __init__(self, name, position, skill_level=5):
-        self.name = name
-        self.position = position
-        self.skill_level = skill_level
+class PairTotals:
+    """Within-team sums of a square pair matrix, updated per A/B swap.
     
-    def __repr__(self):
-        return f"{self.name} ({self.position}, lvl:{self.skill_level})"
+    Keeps each player's row sum over the current members of either team,
+    so the totals after a proposed swap cost O(1) and accepting it O(n).
+    """
+    __slots__ = ('matrix', 'row_a', 'row_b', 'total_a', 'total_b')
+    
+    def __init__(self, matrix):
+        self.matrix = matrix
+        self.row_a = [0.0] * len(matrix)
+        self.row_b = [0.0] * len(matrix)
+        self.total_a = self.total_b = 0.0
+    
+    def reset(self, order, size_a):
+        """Recompute from scratch for a split whose first size_a entries are team A"""
+        row_a, row_b = self.row_a, self.row_b
+        for p, weights in enumerate(self.matrix):
+            row_a[p] = sum(weights[order[k]] for k in range(size_a))
+            row_b[p] = sum(weights[order[k]] for k in range(size_a, len(order)))
+        self.total_a = sum(row_a[order[k]] for k in range(size_a)) / 2
+        self.total_b = sum(row_b[order[k]] for k in range(size_a, len(order))) / 2
+    
+    def swapped(self, a, b):
+        """(total_a, total_b) if a, now in team A, traded places with b"""
+        pair = self.matrix[a][b]
+        return (
+            self.total_a - self.row_a[a] + self.row_a[b] - pair,
+            self.total_b - self.row_b[b] + self.row_b[a] - pair
+        )
+    
+    def apply(self, a, b, totals):
+        """Commit a swap, given the totals swapped() returned for it"""
+        self.total_a, self.total_b = totals
+        row_a, row_b = self.row_a, self.row_b
+        for p, weights in enumerate(self.matrix):
+            delta = weights[b] - weights[a]
+            row_a[p] += delta
+            row_b[p] -= delta
 
 class TeamBalancer:
     POSITION_WEIGHTS = {
@@ -388,67 +2708,350 @@ class TeamBalancer:
         'forward': 1.5
     }
     
+    # Team-shape bonuses: 'tiers' pays the bonus of the highest threshold the
+    # group's player count reaches, 'per_player' pays per player in the group
+    POSITION_BONUSES = [
+        {'positions': ['goalkeeper'], 'tiers': {'1': 3}},
+        {'positions': ['defender'], 'per_player': 0.5},
+        {'positions': ['left_wing', 'right_wing'], 'tiers': {'1': 1}},
+        {'positions': ['midfielder'], 'tiers': {'1': 1, '2': 2}},
+        {'positions': ['forward'], 'per_player': 0.3}
+    ]
+    
+    # Swap proposals per local-search chain before restarting from a fresh random split
+    RESTART_INTERVAL = 100
+    
     @staticmethod
-    def calculate_team_strength(players):
+    def calculate_team_strength(players, model=None):
         if not players:
             return 0
-            
-        strength = 0
-        position_count = {
-            'goalkeeper': 0, 'defender': 0, 'left_wing': 0, 
-            'right_wing': 0, 'midfielder': 0, 'forward': 0
-        }
-        
-        for player in players:
-            strength += player.skill_level * TeamBalancer.POSITION_WEIGHTS.get(player.position, 1.0)
-            position_count[player.position] += 1
-        
-        if position_count['goalkeeper'] > 0:
-            strength += 3
         
-        if position_count['defender'] > 0:
-            strength += position_count['defender'] * 0.5
-        
-        if position_count['left_wing'] > 0 or position_count['right_wing'] > 0:
-            strength += 1
-        
-        if position_count['midfielder'] >= 2:
-            strength += 2
-        elif position_count['midfielder'] > 0:
-            strength += 1
-        
-        if position_count['forward'] > 0:
-            strength += position_count['forward'] * 0.3
-        
-        return strength
+        model = model or scoring_models.get()
+        return model.team_strength([model.code(p.position) for p in players], [p.skill_level for p in players])
     
     @staticmethod
-    def balance_teams(players, iterations=1000):
+    def pair_total(indices, pair_weights):
+        """Sum of pair_weights over every pair of squad indices in one team"""
+        return sum(
+            pair_weights[i][j]
+            for k, i in enumerate(indices)
+            for j in indices[k + 1:]
+        )
+    
+    @staticmethod
+    def balance_teams(players, iterations=1000, plan=None, model=None, terms=None):
+        """Split a list of Player objects, returning two lists of players"""
         if len(players) < 2:
             return players, []
         
-        best_team_a = []
-        best_team_b = []
-        best_balance_diff = float('inf')
+        squad = Squad.from_players(players)
+        team_a, team_b = TeamBalancer.search(squad, iterations, plan=plan, model=model, terms=terms)[0]
+        return [players[i] for i in team_a], [players[i] for i in team_b]
+    
+    @staticmethod
+    def objective(squad, team_a, team_b, model, terms=None):
+        """Score a split the way search() does (lower is better)"""
+        terms = terms or SearchTerms()
+        score = abs(squad.strength(team_a, model) - squad.strength(team_b, model))
+        if terms.use_synergy:
+            score += terms.synergy_weight * abs(
+                TeamBalancer.pair_total(team_a, terms.pair_weights) - TeamBalancer.pair_total(team_b, terms.pair_weights)
+            )
+        if terms.use_prediction:
+            ratings = terms.ratings
+            score += terms.prediction_weight * abs(
+                EloIndex.win_probability([ratings[i] for i in team_a], [ratings[i] for i in team_b]) - 0.5
+            )
+        if terms.use_rotation:
+            score += terms.rotation_weight * (
+                TeamBalancer.pair_total(team_a, terms.repeat_counts) + TeamBalancer.pair_total(team_b, terms.repeat_counts)
+            )
+        return score
+    
+    @staticmethod
+    def split_key(team_a, n):
+        """Bitmask identifying a split up to A/B symmetry: the side without squad index 0"""
+        mask = sum(1 << i for i in team_a)
+        return ((1 << n) - 1) ^ mask if mask & 1 else mask
+    
+    @staticmethod
+    def balance(squad, iterations=1000, plan=None, model=None, terms=None, top_k=1, timeout=BALANCE_TIMEOUT):
+        """Balance a squad, fanning out over the process pool for large squads.
+        
+        Squads of at least PARALLEL_MIN_PLAYERS players split the iterations
+        over one independent search chain per worker, each with its own
+        seed, and merge the top_k best distinct splits of the chains that
+        finish within timeout seconds. Smaller squads, a pool that is still
+        warming up, or any failure of the pool use a single in-process
+        search. Returns splits best first, like search().
+        """
+        model = model or scoring_models.get()
+        terms = terms or SearchTerms()
+        deadline = time.monotonic() + timeout
+        
+        if len(squad) >= PARALLEL_MIN_PLAYERS and parallel_search_enabled() and get_search_pool(wait=False):
+            try:
+                pool = get_search_pool()
+                chain_iterations = max(-(-iterations // PARALLEL_WORKERS), TeamBalancer.RESTART_INTERVAL)
+                futures = [
+                    pool.submit(run_search_chain, random.getrandbits(64), squad, chain_iterations, plan, model, terms, top_k, deadline)
+                    for _ in range(PARALLEL_WORKERS)
+                ]
+                # Chains check the deadline themselves; allow a little slack for IPC
+                done, not_done = concurrent.futures.wait(futures, timeout=timeout + PARALLEL_GRACE)
+                for future in not_done:
+                    future.cancel()
+                
+                results = [future.result() for future in done if future.exception() is None]
+                if results:
+                    merged = {
+                        TeamBalancer.split_key(split[0], len(squad)): split
+                        for splits in results for split in splits
+                    }
+                    return sorted(
+                        merged.values(),
+                        key=lambda split: TeamBalancer.objective(squad, split[0], split[1], model, terms)
+                    )[:top_k]
+                logger.warning("⚠️ No parallel search chain finished in time, searching in-process")
+            except Exception as e:
+                logger.warning(f"⚠️ Parallel search unavailable, searching in-process: {e}")
         
-        for _ in range(iterations):
-            shuffled = players.copy()
-            random.shuffle(shuffled)
+        return TeamBalancer.search(squad, iterations, plan, model, terms, top_k, deadline)
+    
+    @staticmethod
+    def search(squad, iterations=1000, plan=None, model=None, terms=None, top_k=1, deadline=None):
+        """Split a Squad into two teams of (near) equal strength.
+        
+        Runs random-restart local search: each chain starts from a random
+        split and proposes random A/B swaps, keeping those that do not make
+        the objective worse. The objective is the strength difference plus
+        the active SearchTerms: synergy_weight times the difference in
+        summed pair synergy between the teams, prediction_weight times how
+        far the predicted outcome is from 50/50, and rotation_weight times
+        the recent pairings kept together within both teams. All terms are
+        updated incrementally per swap, so a rejected proposal costs O(1).
+        
+        The search state is a single index permutation whose first size_a
+        entries are team A; all buffers are allocated once up front, so
+        proposals allocate nothing. An optional SplitPlan restricts the
+        search to splits satisfying its constraints: restarts draw feasible
+        splits and swaps only move unconstrained players.
+        
+        Every split the chains visit is a candidate for the top_k best
+        distinct splits, where a split and its A/B mirror count as one.
+        
+        deadline is an optional time.monotonic() value; the search stops at
+        the first restart after it has passed.
+        
+        Returns up to top_k (team_a, team_b) pairs of squad index lists,
+        best first.
+        """
+        n = len(squad)
+        if n < 2:
+            return [(list(range(n)), [])]
+        
+        plan = plan or SplitPlan(n)
+        model = model or scoring_models.get()
+        values, groups = squad.encode(model)
+        tables = model.tables
+        terms = terms or SearchTerms()
+        synergy_weight, prediction_weight, rotation_weight = terms.synergy_weight, terms.prediction_weight, terms.rotation_weight
+        synergy = PairTotals(terms.pair_weights) if terms.use_synergy else None
+        rotation = PairTotals(terms.repeat_counts) if terms.use_rotation else None
+        ratings = terms.ratings if terms.use_prediction else None
+        
+        # Plain lists beat typed arrays for the hot loop, since reading an
+        # array element boxes a fresh Python object
+        values, groups = list(values), list(groups)
+        order = list(range(n))
+        kept = {}
+        worst_kept = float('inf')
+        count_a = [0] * len(tables)
+        count_b = [0] * len(tables)
+        zero_counts = [0] * len(tables)
+        iteration = 0
+        
+        def keep(score, size_a):
+            """Remember the current split if it is among the top_k distinct ones"""
+            nonlocal worst_kept
+            key = TeamBalancer.split_key(order[:size_a], n)
+            if key in kept and kept[key][0] <= score:
+                return
+            kept[key] = (score, order[:size_a], order[size_a:])
+            if len(kept) > top_k:
+                del kept[max(kept, key=lambda k: kept[k][0])]
+            if len(kept) == top_k:
+                worst_kept = max(entry[0] for entry in kept.values())
+        
+        while iteration < iterations:
+            if deadline is not None and kept and time.monotonic() > deadline:
+                break
+            size_a = plan.random_split(order)
+            if plan.unconstrained:
+                movable_a = range(size_a)
+                movable_b = range(size_a, n)
+            else:
+                movable_a = [k for k in range(size_a) if plan.movable[order[k]]]
+                movable_b = [k for k in range(size_a, n) if plan.movable[order[k]]]
+            
+            linear_a = linear_b = 0.0
+            count_a[:] = zero_counts
+            count_b[:] = zero_counts
+            for k in range(size_a):
+                linear_a += values[order[k]]
+                count_a[groups[order[k]]] += 1
+            for k in range(size_a, n):
+                linear_b += values[order[k]]
+                count_b[groups[order[k]]] += 1
+            bonus_a = sum(table[count] for table, count in zip(tables, count_a))
+            bonus_b = sum(table[count] for table, count in zip(tables, count_b))
+            strength_a = linear_a + bonus_a
+            strength_b = linear_b + bonus_b
+            
+            score = abs(strength_a - strength_b)
+            if synergy is not None:
+                synergy.reset(order, size_a)
+                score += synergy_weight * abs(synergy.total_a - synergy.total_b)
             
-            split_point = len(shuffled) // 2
-            team_a = shuffled[:split_point]
-            team_b = shuffled[split_point:]
+            rating_a = rating_b = 0.0
+            size_b = n - size_a
+            if ratings is not None and size_a and size_b:
+                rating_a = sum(ratings[order[k]] for k in range(size_a))
+                rating_b = sum(ratings[order[k]] for k in range(size_a, n))
+                score += prediction_weight * abs(1.0 / (1.0 + 10.0 ** ((rating_b / size_b - rating_a / size_a) / ELO_SCALE)) - 0.5)
             
-            strength_a = TeamBalancer.calculate_team_strength(team_a)
-            strength_b = TeamBalancer.calculate_team_strength(team_b)
-            balance_diff = abs(strength_a - strength_b)
+            if rotation is not None:
+                rotation.reset(order, size_a)
+                score += rotation_weight * (rotation.total_a + rotation.total_b)
             
-            if balance_diff < best_balance_diff:
-                best_balance_diff = balance_diff
-                best_team_a = team_a
-                best_team_b = team_b
+            if score < worst_kept:
+                keep(score, size_a)
+            
+            if not movable_a or not movable_b:
+                iteration += 1
+                continue
+            
+            for _ in range(min(TeamBalancer.RESTART_INTERVAL, iterations - iteration)):
+                iteration += 1
+                i = random.choice(movable_a)
+                j = random.choice(movable_b)
+                a, b = order[i], order[j]
+                group_a, group_b = groups[a], groups[b]
+                
+                # Bonus deltas are table lookups on the two affected group counts
+                new_linear_a = linear_a - values[a] + values[b]
+                new_linear_b = linear_b - values[b] + values[a]
+                new_bonus_a = bonus_a + tables[group_a][count_a[group_a] - 1] - tables[group_a][count_a[group_a]]
+                count_a[group_a] -= 1
+                new_bonus_a += tables[group_b][count_a[group_b] + 1] - tables[group_b][count_a[group_b]]
+                count_a[group_b] += 1
+                new_bonus_b = bonus_b + tables[group_b][count_b[group_b] - 1] - tables[group_b][count_b[group_b]]
+                count_b[group_b] -= 1
+                new_bonus_b += tables[group_a][count_b[group_a] + 1] - tables[group_a][count_b[group_a]]
+                count_b[group_a] += 1
+                new_strength_a = new_linear_a + new_bonus_a
+                new_strength_b = new_linear_b + new_bonus_b
+                
+                new_score = abs(new_strength_a - new_strength_b)
+                if synergy is not None:
+                    new_synergy = synergy.swapped(a, b)
+                    new_score += synergy_weight * abs(new_synergy[0] - new_synergy[1])
+                if ratings is not None:
+                    new_rating_a = rating_a - ratings[a] + ratings[b]
+                    new_rating_b = rating_b - ratings[b] + ratings[a]
+                    new_score += prediction_weight * abs(1.0 / (1.0 + 10.0 ** ((new_rating_b / size_b - new_rating_a / size_a) / ELO_SCALE)) - 0.5)
+                if rotation is not None:
+                    new_repeats = rotation.swapped(a, b)
+                    new_score += rotation_weight * (new_repeats[0] + new_repeats[1])
+                
+                if new_score > score:
+                    count_a[group_b] -= 1
+                    count_a[group_a] += 1
+                    count_b[group_a] -= 1
+                    count_b[group_b] += 1
+                    continue
+                
+                order[i], order[j] = b, a
+                linear_a, linear_b = new_linear_a, new_linear_b
+                bonus_a, bonus_b = new_bonus_a, new_bonus_b
+                strength_a, strength_b = new_strength_a, new_strength_b
+                score = new_score
+                if synergy is not None:
+                    synergy.apply(a, b, new_synergy)
+                if ratings is not None:
+                    rating_a, rating_b = new_rating_a, new_rating_b
+                if rotation is not None:
+                    rotation.apply(a, b, new_repeats)
+                
+                if score < worst_kept:
+                    keep(score, size_a)
         
-        return best_team_a, best_team_b
+        return [(team_a, team_b) for _, team_a, team_b in sorted(kept.values(), key=lambda entry: entry[0])]
+
+_search_pool = None
+_search_pool_lock = threading.Lock()
+_search_pool_ready = threading.Event()
+
+def running_under_gevent():
+    """True in the async serving mode, where gevent has patched threading.
+    
+    multiprocessing pools are not reliable under gevent's monkey-patching,
+    so parallel balancing is skipped there.
+    """
+    gevent_monkey = sys.modules.get('gevent.monkey')
+    return gevent_monkey is not None and gevent_monkey.is_module_patched('threading')
+
+def parallel_search_enabled():
+    return PARALLEL_WORKERS > 1 and not running_under_gevent()
+
+def get_search_pool(wait=True):
+    """The process pool used for parallel balancing, started on first use.
+    
+    Workers come from a forkserver rather than a fork of this process,
+    which already runs threads (Sheets I/O, replicators, gthread workers)
+    whose held locks a forked child would inherit. Starting the forkserver
+    and importing the app in every worker takes seconds, so the workers
+    are warmed up in the background; with wait=False this returns None
+    until they have all answered.
+    """
+    global _search_pool
+    with _search_pool_lock:
+        if _search_pool is None:
+            _search_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=PARALLEL_WORKERS,
+                mp_context=multiprocessing.get_context('forkserver')
+            )
+            # The executor only starts a worker process per pending task
+            warmups = [_search_pool.submit(search_worker_pid) for _ in range(PARALLEL_WORKERS)]
+            
+            def warmed(_):
+                if all(future.done() for future in warmups):
+                    _search_pool_ready.set()
+            for future in warmups:
+                future.add_done_callback(warmed)
+    if not wait and not _search_pool_ready.is_set():
+        return None
+    return _search_pool
+
+def warm_search_pool():
+    """Start the search pool at worker boot (see gunicorn.conf.py) so no request waits for it"""
+    if parallel_search_enabled():
+        get_search_pool(wait=False)
+
+def search_worker_pid():
+    """Warm-up task: unpickling it makes a pool worker import this module"""
+    return os.getpid()
+
+def run_search_chain(seed, squad, iterations, plan, model, terms, top_k, deadline):
+    """Entry point for one search chain in a pool worker"""
+    random.seed(seed)
+    return TeamBalancer.search(squad, iterations, plan, model, terms, top_k, deadline)
+
+# Scoring models, hot-reloaded from SCORING_MODELS_PATH when it exists
+scoring_models = ScoringModelRegistry(SCORING_MODELS_PATH, {
+    'position_weights': TeamBalancer.POSITION_WEIGHTS,
+    'bonuses': TeamBalancer.POSITION_BONUSES
+})
 
 @app.route('/')
 def home():
@@ -1193,6 +3796,9 @@ def home():
                             <button onclick="balanceTeams()" style="background:linear-gradient(45deg,#FF9800,#F57C00)">
                                 ⚖️ Balance Teams
                             </button>
+                            <button id="nextAlternativeBtn" class="secondary-btn" onclick="nextAlternative()" style="display:none">
+                                🔁 Next Option
+                            </button>
                             <button class="secondary-btn" onclick="randomizeTeams()">
                                 🎲 Random Teams
                             </button>
@@ -1416,6 +4022,14 @@ def home():
     </div>
 
     <script>
+// Every request goes to the group named by ?group= in the page URL
+const currentGroup = new URLSearchParams(window.location.search).get('group') || 'default';
+const baseFetch = window.fetch.bind(window);
+window.fetch = (url, options = {}) => baseFetch(url, {
+    ...options,
+    headers: { ...(options.headers || {}), 'X-Group-ID': currentGroup }
+});
+
 function addPlayerField() {
     playerCount++;
     const form = document.getElementById('playerForm');
@@ -1577,7 +4191,7 @@ function balanceTeams() {
         headers: {
             'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ players: players })
+        body: JSON.stringify({ players: players, alternatives: 5 })
     })
     .then(response => response.json())
     .then(data => {
@@ -1586,8 +4200,9 @@ function balanceTeams() {
             return;
         }
         
-        displayTeams(data.team_a, data.team_b, data.strength_a, data.strength_b);
-        currentTeams = { team_a: data.team_a, team_b: data.team_b };
+        balanceAlternatives = data.alternatives || [data];
+        alternativeIndex = 0;
+        showAlternative();
         
         // Show score section
         document.getElementById('scoreSection').style.display = 'grid';
@@ -1599,6 +4214,26 @@ function balanceTeams() {
     });
 }
 
+// Splits returned by the last balance call, cycled through without another request
+let balanceAlternatives = [];
+let alternativeIndex = 0;
+
+function showAlternative() {
+    const split = balanceAlternatives[alternativeIndex];
+    displayTeams(split.team_a, split.team_b, split.strength_a, split.strength_b);
+    currentTeams = { team_a: split.team_a, team_b: split.team_b };
+    
+    const button = document.getElementById('nextAlternativeBtn');
+    button.style.display = balanceAlternatives.length > 1 ? 'inline-block' : 'none';
+    button.textContent = `🔁 Next Option (${alternativeIndex + 1}/${balanceAlternatives.length})`;
+}
+
+function nextAlternative() {
+    if (balanceAlternatives.length < 2) return;
+    alternativeIndex = (alternativeIndex + 1) % balanceAlternatives.length;
+    showAlternative();
+}
+
 function randomizeTeams() {
     const players = getPlayersFromForm();
     
@@ -1623,6 +4258,8 @@ function randomizeTeams() {
         
         displayTeams(data.team_a, data.team_b, data.strength_a, data.strength_b);
         currentTeams = { team_a: data.team_a, team_b: data.team_b };
+        balanceAlternatives = [];
+        document.getElementById('nextAlternativeBtn').style.display = 'none';
         
         // Show score section
         document.getElementById('scoreSection').style.display = 'grid';
@@ -1783,23 +4420,18 @@ function updatePlayerStats() {
     if (!statsBody) return;
 
     // Add timestamp to prevent caching
-    fetch('/load-data?' + new Date().getTime())
+    fetch('/stats/summary?' + new Date().getTime())
         .then(response => response.json())
-        .then(data => {
-            const players = data.players || {};
+        .then(summary => {
+            const playersArray = summary.players || [];
             statsBody.innerHTML = '';
 
-            if (Object.keys(players).length === 0) {
+            if (playersArray.length === 0) {
                 statsBody.innerHTML = '<tr><td colspan="7" style="text-align: center;">No player data available. Record a game first!</td></tr>';
                 return;
             }
 
-            // Convert players object to array and sort by games played
-            const playersArray = Object.entries(players).map(([name, stats]) => ({
-                name,
-                ...stats
-            })).sort((a, b) => b.games_played - a.games_played);
-
+            // Players arrive sorted by games played
             playersArray.forEach(player => {
                 const winRate = player.games_played > 0 ? (player.wins / player.games_played * 100) : 0;
                 const winRateClass = winRate >= 60 ? 'high' : winRate >= 40 ? 'medium' : 'low';
@@ -1875,8 +4507,8 @@ function updateGameHistory() {
 }
 
 function exportData() {
-    // Implementation for exporting data
-    alert('Export functionality would go here');
+    // Stream the full game history from the server as a download
+    window.location.href = '/export/games?format=ndjson&group=' + encodeURIComponent(currentGroup);
 }
 
 function importData() {
@@ -2248,22 +4880,34 @@ function getPlayerInitials(name) {
 
 @app.route('/storage-status')
 def storage_status():
-    data = load_data()
-    total_games = len(data.get('games', []))
-    total_players = len(data.get('players', {}))
+    tenant = current_tenant()
+    summary = tenant.summary()
     
     return jsonify({
-        'using_google_sheets': sheets_manager.sheet is not None,
-        'total_games': total_games,
-        'total_players': total_players
+        'group': tenant.name,
+        'using_google_sheets': tenant.manager.sheet is not None,
+        'total_games': summary['total_games'],
+        'total_players': summary['total_players'],
+        'sheets_quota': sheets_quota.status(),
+        'replication': tenant.replicator.status(),
+        'cache': tenants.status()
     })
 
+@app.route('/stats/summary')
+def stats_summary():
+    """Precomputed counts, leaderboards, recent games and player list"""
+    try:
+        return jsonify(current_tenant().summary())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/test-google-sheets')
 def test_google_sheets():
     try:
-        if sheets_manager.sheet:
+        manager = current_tenant().manager
+        if manager.sheet:
             # Test by trying to access the sheet
-            sheets_manager.sheet.worksheets()
+            sheets_quota.call(manager.sheet.worksheets)
             return jsonify({'connected': True})
         else:
             return jsonify({'connected': False, 'error': 'Google Sheets not configured'})
@@ -2287,23 +4931,16 @@ def save_players():
         data = request.get_json()
         players_data = data['players']
         
-        all_data = load_data()
+        all_data = load_data(for_update=True)
         all_data['current_players'] = players_data
         
         for player_data in players_data:
             name = player_data['name']
             if name not in all_data['players']:
-                all_data['players'][name] = {
-                    'games_played': 0,
-                    'wins': 0,
-                    'total_goals': 0,
-                    'average_rating': 0,
-                    'last_played': None,
-                    'position': player_data['position'],
-                    'skill_level': player_data['skill_level']
-                }
+                all_data['players'][name] = new_player_stats(player_data['position'], player_data['skill_level'])
         
-        if save_data(all_data):
+        # The game history is untouched, so the game indexes stay valid
+        if save_data(all_data, games_appended=True):
             return jsonify({'success': True})
         else:
             return jsonify({'error': 'Failed to save data'}), 500
@@ -2314,89 +4951,302 @@ def save_players():
 @app.route('/record-game', methods=['POST'])
 def record_game():
     try:
-        game_data = request.get_json()
-        all_data = load_data()
+        game_data = request.get_json(silent=True)
+        if not isinstance(game_data, dict):
+            return jsonify({'error': 'Invalid game', 'errors': ['game must be an object']}), 400
+        normalize_events(game_data)
+        game_data.setdefault('id', f'game_{int(time.time() * 1000)}')
+        errors = validate_game(game_data)
+        if errors:
+            return jsonify({'error': 'Invalid game', 'errors': errors}), 400
+        
+        all_data = load_data(for_update=True)
         all_data['games'].append(game_data)
+        apply_game_to_players(all_data['players'], game_data)
         
-        team_a_won = game_data['team_a']['score'] > game_data['team_b']['score']
-        team_b_won = game_data['team_b']['score'] > game_data['team_a']['score']
-        
-        for player in game_data['team_a']['players']:
-            name = player['name']
-            if name not in all_data['players']:
-                all_data['players'][name] = {
-                    'games_played': 0,
-                    'wins': 0,
-                    'total_goals': 0,
-                    'average_rating': 0,
-                    'last_played': None,
-                    'position': player.get('position', 'unknown'),
-                    'skill_level': player.get('skill_level', 5)
-                }
+        if save_data(all_data, games_appended=True):
+            current_tenant().sync_indexes(all_data)
+            return jsonify({'success': True})
+        else:
+            return jsonify({'error': 'Failed to save game data'}), 500
             
-            all_data['players'][name]['games_played'] += 1
-            if team_a_won:
-                all_data['players'][name]['wins'] += 1
-            all_data['players'][name]['last_played'] = game_data['date']
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/players/rename', methods=['POST'])
+def rename_player_route():
+    try:
+        payload = request.get_json()
+        old_name = payload['old_name']
+        new_name = payload['new_name'].strip()
         
-        for player in game_data['team_b']['players']:
-            name = player['name']
-            if name not in all_data['players']:
-                all_data['players'][name] = {
-                    'games_played': 0,
-                    'wins': 0,
-                    'total_goals': 0,
-                    'average_rating': 0,
-                    'last_played': None,
-                    'position': player.get('position', 'unknown'),
-                    'skill_level': player.get('skill_level', 5)
-                }
-            
-            all_data['players'][name]['games_played'] += 1
-            if team_b_won:
-                all_data['players'][name]['wins'] += 1
-            all_data['players'][name]['last_played'] = game_data['date']
+        all_data = load_data(for_update=True)
+        if old_name not in all_data['players']:
+            return jsonify({'error': f'Unknown player: {old_name}'}), 404
+        if not new_name or new_name in all_data['players']:
+            return jsonify({'error': f'Name not available: {new_name}'}), 400
+        
+        rename_player(all_data, old_name, new_name)
         
         if save_data(all_data):
-            return jsonify({'success': True})
+            return jsonify({'success': True, 'id': all_data['players'][new_name]['id']})
         else:
-            return jsonify({'error': 'Failed to save game data'}), 500
+            return jsonify({'error': 'Failed to save renamed player'}), 500
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/balance-teams', methods=['POST'])
-def balance_teams():
+@app.route('/players/<name>/history')
+def player_history(name):
+    """Paginated list of the games a player took part in, newest first"""
     try:
-        data = request.get_json()
-        players_data = data['players']
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), 200)
         
-        players = []
-        for player_data in players_data:
-            player = Player(
-                name=player_data['name'],
-                position=player_data['position'],
-                skill_level=player_data['skill_level']
-            )
-            players.append(player)
+        data = load_data()
+        if name not in data['players']:
+            return jsonify({'error': f'Unknown player: {name}'}), 404
+        
+        tenant = current_tenant()
+        index = tenant.history_index.sync(data, tenant.games_version())
+        games = []
+        for position in index.positions(name, (page - 1) * per_page, per_page):
+            game = data['games'][position]
+            team_key = 'team_a' if any(p['name'] == name for p in game['team_a']['players']) else 'team_b'
+            other_key = 'team_b' if team_key == 'team_a' else 'team_a'
+            score, other_score = game[team_key]['score'], game[other_key]['score']
+            games.append({
+                **game,
+                'team': team_key,
+                'result': 'win' if score > other_score else 'loss' if score < other_score else 'draw'
+            })
         
-        team_a, team_b = TeamBalancer.balance_teams(players)
+        return jsonify({
+            'player': name,
+            'total_games': index.count(name),
+            'page': page,
+            'per_page': per_page,
+            'games': games
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/synergy/<name>')
+def player_synergy(name):
+    """Teammate and opponent win rates of one player against everyone else"""
+    try:
+        # Pairs that never met have no win rate to report
+        min_games = max(request.args.get('min_games', 1, type=int), 1)
+        data = load_data()
+        if name not in data['players']:
+            return jsonify({'error': f'Unknown player: {name}'}), 404
         
-        team_a_dict = [{'name': p.name, 'position': p.position, 'skill_level': p.skill_level} for p in team_a]
-        team_b_dict = [{'name': p.name, 'position': p.position, 'skill_level': p.skill_level} for p in team_b]
+        tenant = current_tenant()
+        teammates, opponents = tenant.synergy_index.sync(data, tenant.games_version()).partners(name, min_games)
+        return jsonify({'player': name, 'teammates': teammates, 'opponents': opponents})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/synergy/<name>/<other>')
+def pair_synergy(name, other):
+    """Head-to-head and teammate record of two players"""
+    try:
+        data = load_data()
+        for player in (name, other):
+            if player not in data['players']:
+                return jsonify({'error': f'Unknown player: {player}'}), 404
         
-        strength_a = TeamBalancer.calculate_team_strength(team_a)
-        strength_b = TeamBalancer.calculate_team_strength(team_b)
+        tenant = current_tenant()
+        return jsonify(tenant.synergy_index.sync(data, tenant.games_version()).pair(name, other))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/leaderboard')
+def leaderboard():
+    """Ranking by metric: top N (limit/offset), a player's rank (player) or a value range (min/max)"""
+    metric = request.args.get('metric', 'wins')
+    window = request.args.get('window', 'all')
+    if metric not in Leaderboard.METRICS:
+        return jsonify({'error': f'Unknown metric: {metric}'}), 400
+    if window not in LeaderboardIndex.WINDOWS:
+        return jsonify({'error': f'Unknown window: {window}'}), 400
+    
+    try:
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 200)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        low = request.args.get('min', type=float)
+        high = request.args.get('max', type=float)
+        
+        tenant = current_tenant()
+        index = tenant.leaderboard_index.sync(load_data(), tenant.games_version())
+        board = index.boards[window]
+        if low is not None or high is not None:
+            ranked = board.value_range(metric, low, high)[offset:offset + limit]
+        else:
+            ranked = board.top(metric, limit, offset)
         
-        response = {
-            'team_a': team_a_dict,
-            'team_b': team_b_dict,
-            'strength_a': strength_a,
-            'strength_b': strength_b
+        result = {
+            'metric': metric,
+            'window': window,
+            'ranked_players': board.size(metric),
+            'entries': [index.entry(window, metric, player_id, value) for player_id, value in ranked]
         }
         
+        name = request.args.get('player')
+        if name:
+            player_id = index.registry.id_for(name)
+            value = board.value(metric, player_id)
+            result['player'] = None if value is None else index.entry(window, metric, player_id, value)
+        
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/stats/window')
+def window_stats():
+    """Player stats over each player's last N games (last), a season, or a date range (from/to)"""
+    try:
+        last = request.args.get('last', type=int)
+        season = request.args.get('season', type=int)
+        start, end = request.args.get('from'), request.args.get('to')
+        if sum(option is not None for option in (last, season, start or end)) != 1:
+            return jsonify({'error': 'Pass exactly one of last, season or from/to'}), 400
+        
+        data = load_data()
+        games = data['games']
+        name = request.args.get('player')
+        names = [name] if name else list(data['players'])
+        tenant = current_tenant()
+        
+        if last is not None:
+            if last < 1:
+                return jsonify({'error': 'last must be positive'}), 400
+            window = {'last': last}
+            history = tenant.history_index.sync(data, tenant.games_version())
+            stats = {}
+            for player in names:
+                stats.update(aggregate_games(games, history.positions(player, 0, last), {player}))
+            game_count = None
+        else:
+            if season is not None:
+                start_date, end_date = season_bounds(season)
+            else:
+                start_date = date.fromisoformat(start) if start else None
+                end_date = date.fromisoformat(end) if end else None
+            window = {
+                'from': start_date.isoformat() if start_date else None,
+                'to': end_date.isoformat() if end_date else None
+            }
+            if season is not None:
+                window['season'] = season
+            positions = tenant.date_index.sync(data, tenant.games_version()).positions(start_date, end_date)
+            stats = aggregate_games(games, positions, set(names) if name else None)
+            game_count = len(positions)
+        
+        players = sorted(
+            ({'name': player, **row} for player, row in stats.items()),
+            key=lambda row: (-row['games'], -row['win_rate'])
+        )
+        return jsonify({'window': window, 'games': game_count, 'players': players})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/predict', methods=['POST'])
+def predict():
+    """Predicted outcome of a proposed split from the players' Elo ratings"""
+    try:
+        data = request.get_json()
+        names_a = [player['name'] if isinstance(player, dict) else player for player in data['team_a']]
+        names_b = [player['name'] if isinstance(player, dict) else player for player in data['team_b']]
+        
+        tenant = current_tenant()
+        elo = tenant.elo_index.sync(load_data(), tenant.games_version())
+        probability = elo.predict(names_a, names_b)
+        return jsonify({
+            'win_probability_a': probability,
+            'win_probability_b': 1 - probability,
+            'ratings_a': dict(zip(names_a, elo.ratings(names_a))),
+            'ratings_b': dict(zip(names_b, elo.ratings(names_b))),
+            'model': elo.quality()
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/balance-teams', methods=['POST'])
+def balance_teams():
+    try:
+        data = request.get_json()
+        squad = Squad.from_payload(data['players'])
+        
+        plan = SplitPlan.from_names(squad.names, data.get('constraints'))
+        model = scoring_models.get(data.get('scoring_model'))
+        if model is None:
+            return jsonify({'error': f"Unknown scoring model: {data.get('scoring_model')}"}), 400
+        
+        synergy_weight = float(data.get('synergy_weight', 0))
+        prediction_weight = float(data.get('prediction_weight', 0))
+        rotation_weight = float(data.get('rotation_weight', 0))
+        pair_weights = ratings = repeat_counts = None
+        
+        # Plain strength balancing never touches the game history
+        if synergy_weight > 0 or prediction_weight > 0 or rotation_weight > 0:
+            tenant = current_tenant()
+            history = load_data()
+            games_version = tenant.games_version()
+            if synergy_weight > 0:
+                pair_weights = tenant.synergy_index.sync(history, games_version).teammate_matrix(squad.names)
+            # Once the history is loaded, ratings are cheap enough to always report the predicted outcome
+            ratings = tenant.elo_index.sync(history, games_version).ratings(squad.names)
+            if rotation_weight > 0:
+                repeat_counts = tenant.rotation_index.sync(history, games_version).matrix(squad.names)
+        
+        try:
+            top_k = min(max(int(data.get('alternatives', 1)), 1), MAX_ALTERNATIVES)
+            timeout = min(float(data.get('timeout', BALANCE_TIMEOUT)), BALANCE_TIMEOUT)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'alternatives must be an integer and timeout a number'}), 400
+        if not timeout > 0:
+            return jsonify({'error': 'timeout must be positive'}), 400
+        terms = SearchTerms(
+            pair_weights=pair_weights, synergy_weight=synergy_weight,
+            ratings=ratings, prediction_weight=prediction_weight,
+            repeat_counts=repeat_counts, rotation_weight=rotation_weight
+        )
+        splits = TeamBalancer.balance(squad, plan=plan, model=model, terms=terms, top_k=top_k, timeout=timeout)
+        
+        def describe(team_a, team_b):
+            split = {
+                'team_a': squad.to_dicts(team_a),
+                'team_b': squad.to_dicts(team_b),
+                'strength_a': squad.strength(team_a, model),
+                'strength_b': squad.strength(team_b, model)
+            }
+            
+            if ratings is not None:
+                split['win_probability'] = EloIndex.win_probability([ratings[i] for i in team_a], [ratings[i] for i in team_b])
+            
+            if pair_weights is not None:
+                split['synergy_a'] = TeamBalancer.pair_total(team_a, pair_weights)
+                split['synergy_b'] = TeamBalancer.pair_total(team_b, pair_weights)
+            
+            if repeat_counts is not None:
+                split['repeat_pairs_a'] = TeamBalancer.pair_total(team_a, repeat_counts)
+                split['repeat_pairs_b'] = TeamBalancer.pair_total(team_b, repeat_counts)
+            return split
+        
+        alternatives = [describe(team_a, team_b) for team_a, team_b in splits]
+        response = dict(alternatives[0])
+        if top_k > 1:
+            response['alternatives'] = alternatives
+        
         return jsonify(response)
         
+    except ConstraintError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -2404,44 +5254,74 @@ def balance_teams():
 def random_teams():
     try:
         data = request.get_json()
-        players_data = data['players']
-        
-        players = []
-        for player_data in players_data:
-            player = Player(
-                name=player_data['name'],
-                position=player_data['position'],
-                skill_level=player_data['skill_level']
-            )
-            players.append(player)
+        squad = Squad.from_payload(data['players'])
         
-        random.shuffle(players)
-        split_point = len(players) // 2
-        team_a = players[:split_point]
-        team_b = players[split_point:]
+        plan = SplitPlan.from_names(squad.names, data.get('constraints'))
+        model = scoring_models.get(data.get('scoring_model'))
+        if model is None:
+            return jsonify({'error': f"Unknown scoring model: {data.get('scoring_model')}"}), 400
         
-        team_a_dict = [{'name': p.name, 'position': p.position, 'skill_level': p.skill_level} for p in team_a]
-        team_b_dict = [{'name': p.name, 'position': p.position, 'skill_level': p.skill_level} for p in team_b]
-        
-        strength_a = TeamBalancer.calculate_team_strength(team_a)
-        strength_b = TeamBalancer.calculate_team_strength(team_b)
+        order = list(range(len(squad)))
+        split_point = plan.random_split(order)
+        team_a = order[:split_point]
+        team_b = order[split_point:]
         
         response = {
-            'team_a': team_a_dict,
-            'team_b': team_b_dict,
-            'strength_a': strength_a,
-            'strength_b': strength_b
+            'team_a': squad.to_dicts(team_a),
+            'team_b': squad.to_dicts(team_b),
+            'strength_a': squad.strength(team_a, model),
+            'strength_b': squad.strength(team_b, model)
         }
         
         return jsonify(response)
         
+    except ConstraintError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/scoring-models')
+def list_scoring_models():
+    return jsonify({'default': scoring_models.default_name, 'models': scoring_models.names()})
+
 @app.route('/import-data', methods=['POST'])
 def import_data():
+    """Import a full data export (JSON) or stream games line by line (NDJSON).
+    
+    NDJSON imports are journaled in batches of IMPORT_BATCH_SIZE games and
+    merged into the existing history at the end; pass
+    ?resume_from=<checkpoint> to continue an import that stopped part way
+    through.
+    """
     try:
+        if request.mimetype == 'application/x-ndjson':
+            resume_from = request.args.get('resume_from', 0, type=int)
+            all_data = load_data(for_update=True)
+            # Iterating the raw request stream reads it a byte at a time
+            lines = io.BufferedReader(request.stream, IMPORT_READ_BUFFER)
+            try:
+                report = import_games_stream(lines, all_data, resume_from=resume_from)
+            except Exception:
+                # Drop any cached state of the failed attempt; the journal keeps its batches
+                tenants.forget(current_tenant())
+                raise
+            
+            if report['complete']:
+                return jsonify({'success': True, **report})
+            return jsonify({'error': 'Import stopped, resume from checkpoint', **report}), 500
+        
         imported_data = request.get_json()
+        errors = []
+        for index, game in enumerate(imported_data.get('games', [])):
+            try:
+                game_errors = validate_game(normalize_events(game))
+            except ValueError as e:
+                game_errors = [str(e)]
+            if game_errors:
+                errors.append({'record': index + 1, 'errors': game_errors})
+        if errors:
+            return jsonify({'error': 'Invalid games in import', 'errors': errors[:IMPORT_MAX_REPORTED_ERRORS]}), 400
+        
         if save_data(imported_data):
             return jsonify({'success': True})
         else:
@@ -2449,6 +5329,48 @@ def import_data():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/export/<kind>')
+def export_data(kind):
+    """Stream games or players as NDJSON or CSV, optionally gzip-compressed"""
+    if kind not in ('games', 'players'):
+        return jsonify({'error': f'Unknown export: {kind}'}), 404
+    
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+    
+    try:
+        data = load_data()
+        chunks = stream_export(kind, data, fmt)
+        mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+        filename = f'{kind}.{fmt}'
+        
+        if request.args.get('gzip', type=int):
+            chunks = gzip_chunks(chunks)
+            mimetype = 'application/gzip'
+            filename += '.gz'
+        
+        return Response(
+            stream_with_context(chunks),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/export/archive')
+def export_archive():
+    """Download the game history in the compact columnar archive format"""
+    try:
+        data = load_data()
+        return Response(
+            GameArchive.build(data.get('games', []), PlayerRegistry(data['players'])),
+            mimetype='application/octet-stream',
+            headers={'Content-Disposition': 'attachment; filename=games.fba'}
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/clear-data', methods=['POST'])
 def clear_data():
     try:
@@ -2468,21 +5390,249 @@ def clear_data():
 def debug_sheets():
     """Debug endpoint to see what's actually in Google Sheets"""
     try:
-        data = load_data()
-        sheets_connected = sheets_manager.sheet is not None
+        tenant = current_tenant()
+        summary = tenant.summary()
+        sheets_connected = tenant.manager.sheet is not None
         
         debug_info = {
             'sheets_connected': sheets_connected,
-            'total_players': len(data.get('players', {})),
-            'total_games': len(data.get('games', [])),
-            'players': list(data.get('players', {}).keys()),
-            'games_count': len(data.get('games', [])),
-            'current_players_count': len(data.get('current_players', []))
+            'total_players': summary['total_players'],
+            'total_games': summary['total_games'],
+            'players': [row['name'] for row in summary['players']],
+            'games_count': summary['total_games'],
+            'current_players_count': summary['current_players_count']
         }
         
         return jsonify(debug_info)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.cli.command('archive-games')
+@click.argument('path', default='football_games.fba')
+@click.option('--group', default=DEFAULT_GROUP, help='Group whose games to archive.')
+def archive_games_command(path, group):
+    """Write the game history to a columnar archive file."""
+    data = load_data(group)
+    GameArchive.write(path, data.get('games', []), PlayerRegistry(data['players']))
+    click.echo(f"Archived {len(data.get('games', []))} games to {path}")
+
+@app.cli.command('resolve-replication')
+@click.option('--group', default=DEFAULT_GROUP, help='Group whose replication is held.')
+@click.option('--keep', type=click.Choice(['local', 'remote']), required=True, help='Which copy wins.')
+def resolve_replication_command(group, keep):
+    """Settle a held replication conflict (see /storage-status)."""
+    # A standalone tenant, so no background replicator competes with this command
+    replicator = Tenant(group).replicator
+    if not replicator.resolve_conflict(keep):
+        raise click.ClickException(f"No held replication conflict for group '{group}'")
+    if keep == 'local':
+        replicator.replicate_once()
+    click.echo(f"Kept the {keep} data for group '{group}'")
+
+# Offline fitting: strength of pull towards the base model's values, and
+# the share of the most recent games held out to measure the fit
+FIT_PRIOR_STRENGTH = 1.0
+FIT_HOLDOUT = 0.2
+FIT_LOGISTIC_STEPS = 50
+
+class ScoringModelFit:
+    """Refit a scoring model's weights and bonuses against recorded results.
+
+    The structure (positions, bonus groups, tier thresholds) comes from a
+    base model config; only its numbers are refitted. Team strength is
+    linear in those numbers, so every game becomes one row of
+    features(team A) - features(team B), regressed against the goal
+    difference (lstsq) or the win/loss result (logistic) with NumPy. A
+    ridge prior pulls the fit towards the base model, scaled to the
+    data, so sparse positions keep their base values. The fitted vector
+    is rescaled back into the base model's units before publishing.
+    """
+    def __init__(self, base_config):
+        self.base = base_config
+        self.positions = list(base_config['position_weights'])
+        self.bonuses = base_config.get('bonuses', [])
+
+    def base_params(self):
+        params = [float(weight) for weight in self.base['position_weights'].values()]
+        params.append(float(self.base.get('default_weight', 1.0)))
+        for bonus in self.bonuses:
+            if 'per_player' in bonus:
+                params.append(float(bonus['per_player']))
+            previous = 0.0
+            for _, value in sorted((int(t), float(v)) for t, v in bonus.get('tiers', {}).items()):
+                params.append(value - previous)
+                previous = value
+        return params
+
+    def team_features(self, players):
+        """Per-parameter coefficients of one team's strength"""
+        features = [0.0] * (len(self.positions) + 1)
+        counts = {}
+        for player in players:
+            position = player.get('position')
+            column = self.positions.index(position) if position in self.positions else len(self.positions)
+            features[column] += float(player.get('skill_level', 5))
+            counts[position] = counts.get(position, 0) + 1
+
+        for bonus in self.bonuses:
+            count = sum(counts.get(position, 0) for position in bonus['positions'])
+            if 'per_player' in bonus:
+                features.append(float(count))
+            for threshold in sorted(int(t) for t in bonus.get('tiers', {})):
+                features.append(1.0 if count >= threshold else 0.0)
+        return features
+
+    def design(self, games):
+        """Feature matrix and (goal difference, result) targets, one row per game"""
+        import numpy as np
+
+        rows = [
+            [a - b for a, b in zip(self.team_features(game['team_a']['players']), self.team_features(game['team_b']['players']))]
+            for game in games
+        ]
+        goal_difference = np.array([game['team_a']['score'] - game['team_b']['score'] for game in games], dtype=float)
+        return np.array(rows, dtype=float).reshape(len(games), len(self.base_params())), goal_difference
+
+    @staticmethod
+    def solve(X, y, method, prior, prior_strength=FIT_PRIOR_STRENGTH):
+        """Ridge-regularised fit of y on X centred on prior (lstsq or logistic)"""
+        import numpy as np
+
+        penalty = prior_strength * np.eye(X.shape[1])
+        if method == 'lstsq':
+            return np.linalg.solve(X.T @ X + penalty, X.T @ y + penalty @ prior)
+
+        # Newton's method on the penalised logistic log-likelihood
+        params = prior.copy()
+        for _ in range(FIT_LOGISTIC_STEPS):
+            probability = 1.0 / (1.0 + np.exp(-(X @ params)))
+            gradient = X.T @ (probability - y) + penalty @ (params - prior)
+            hessian = (X * (probability * (1 - probability))[:, None]).T @ X + penalty
+            step = np.linalg.solve(hessian, gradient)
+            params -= step
+            if np.abs(step).max() < 1e-8:
+                break
+        return params
+
+    def fit(self, games, method='lstsq', holdout=FIT_HOLDOUT):
+        """Fit on the older games and report accuracy on the most recent ones"""
+        import numpy as np
+
+        X, goal_difference = self.design(games)
+        if method == 'logistic':
+            decisive = goal_difference != 0
+            X, goal_difference = X[decisive], goal_difference[decisive]
+            y = (goal_difference > 0).astype(float)
+        else:
+            y = goal_difference
+
+        split = len(y) - int(len(y) * holdout)
+        if split < 1:
+            raise ValueError('Not enough games to fit a scoring model')
+
+        # Scale the base model into the units of the target before using it as the prior
+        base = np.array(self.base_params())
+        base_prediction = X[:split] @ base
+        scale = self.solve(base_prediction[:, None], y[:split], method, np.zeros(1))[0]
+        if scale <= 0:
+            scale = 1.0
+        params = self.solve(X[:split], y[:split], method, base * scale)
+
+        def accuracy(prediction, rows):
+            decisive = goal_difference[rows] != 0
+            if not decisive.any():
+                return None
+            return float((np.sign(prediction[decisive]) == np.sign(goal_difference[rows][decisive])).mean())
+
+        train, test = slice(0, split), slice(split, len(y))
+        report = {
+            'method': method,
+            'games': int(len(y)),
+            'train_games': split,
+            'holdout_games': int(len(y) - split),
+            'base_accuracy': {'train': accuracy(X[train] @ base, train), 'holdout': accuracy(X[test] @ base, test)},
+            'fitted_accuracy': {'train': accuracy(X[train] @ params, train), 'holdout': accuracy(X[test] @ params, test)}
+        }
+        return self.to_config((params / scale).tolist()), report
+
+    def to_config(self, params):
+        """Rebuild a scoring model config with the base structure and fitted numbers"""
+        values = iter(round(value, 4) for value in params)
+        config = {
+            'position_weights': {position: next(values) for position in self.positions},
+            'default_weight': next(values),
+            'bonuses': []
+        }
+        for bonus in self.bonuses:
+            fitted = {'positions': list(bonus['positions'])}
+            if 'per_player' in bonus:
+                fitted['per_player'] = next(values)
+            if bonus.get('tiers'):
+                total = 0.0
+                fitted['tiers'] = {}
+                for threshold in sorted(int(t) for t in bonus['tiers']):
+                    total += next(values)
+                    fitted['tiers'][str(threshold)] = round(total, 4)
+            config['bonuses'].append(fitted)
+        return config
+
+def publish_scoring_model(path, prefix, config, make_default=False):
+    """Add config to the scoring models file as the next version of prefix, returning its name"""
+    try:
+        with open(path, 'r') as f:
+            models_file = json.load(f)
+    except FileNotFoundError:
+        models_file = {'models': {}}
+
+    models = models_file.setdefault('models', {})
+    versions = [int(name.rsplit('-v', 1)[1]) for name in models if name.startswith(f'{prefix}-v') and name.rsplit('-v', 1)[1].isdigit()]
+    name = f'{prefix}-v{max(versions, default=0) + 1}'
+    models[name] = config
+    if make_default:
+        models_file['default'] = name
+
+    # Write atomically, since workers hot-reload this file
+    tmp_path = f'{path}.tmp.{os.getpid()}'
+    with open(tmp_path, 'w') as f:
+        json.dump(models_file, f, indent=2)
+    os.replace(tmp_path, path)
+    return name
+
+@app.cli.command('fit-scoring-model')
+@click.option('--group', default=DEFAULT_GROUP, help='Group whose games to fit.')
+@click.option('--base', default=None, help='Scoring model whose structure and values to start from (default model if omitted).')
+@click.option('--method', type=click.Choice(['lstsq', 'logistic']), default='lstsq', help='Regress goal difference or win/loss.')
+@click.option('--holdout', type=float, default=FIT_HOLDOUT, help='Share of the most recent games used to measure accuracy.')
+@click.option('--publish', is_flag=True, help=f'Add the fitted model to {SCORING_MODELS_PATH} as a new version.')
+@click.option('--set-default', is_flag=True, help='Make the published model the default.')
+def fit_scoring_model_command(group, base, method, holdout, publish, set_default):
+    """Fit position weights and bonuses to recorded results (requires numpy)."""
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        raise click.ClickException('fit-scoring-model requires numpy (pip install numpy)')
+
+    model = scoring_models.get(base)
+    if model is None:
+        raise click.ClickException(f'Unknown scoring model: {base}')
+
+    games = load_data(group).get('games', [])
+    try:
+        config, report = ScoringModelFit(model.config).fit(games, method, holdout)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    config['fitted'] = {**report, 'base': model.name, 'group': group, 'fitted_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+    click.echo(json.dumps(config, indent=2))
+
+    if publish:
+        name = publish_scoring_model(SCORING_MODELS_PATH, f'fitted-{group}', config, make_default=set_default)
+        click.echo(f"Published scoring model '{name}' to {SCORING_MODELS_PATH}")
+
+# Catch up on anything written while Sheets was unreachable (not in search
+# pool workers, which import this module only to run search chains)
+if multiprocessing.parent_process() is None:
+    tenants.get(DEFAULT_GROUP)
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
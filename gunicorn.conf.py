@@ -0,0 +1,28 @@
+# gunicorn.conf.py
+# Loaded automatically by gunicorn when started from the project directory.
+import os
+
+# SERVING_MODE selects how each worker handles concurrent requests:
+#   sync     - one request per worker (gunicorn default)
+#   threaded - a pool of threads per worker
+#   async    - gevent workers; blocking Sheets calls yield to other requests,
+#              so a worker can hold hundreds of open connections
+SERVING_MODE = os.getenv("SERVING_MODE", "sync")
+
+if os.getenv("PORT"):
+    bind = f"0.0.0.0:{os.getenv('PORT')}"
+
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+
+if SERVING_MODE == "async":
+    worker_class = "gevent"
+    worker_connections = int(os.getenv("WORKER_CONNECTIONS", "500"))
+elif SERVING_MODE == "threaded":
+    worker_class = "gthread"
+    threads = int(os.getenv("GUNICORN_THREADS", "32"))
+
+def post_worker_init(worker):
+    # Start the parallel balancing pool now rather than inside the first request
+    from app import warm_search_pool
+    warm_search_pool()
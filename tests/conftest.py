@@ -0,0 +1,48 @@
+import copy
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Keep app's import-time storage setup away from the working tree and Sheets
+_data_dir = tempfile.mkdtemp(prefix="football-tests-")
+os.environ.pop("GOOGLE_SHEETS_ID", None)
+os.environ["DATA_FILE"] = os.path.join(_data_dir, "football_data.json")
+os.environ["GROUP_DATA_DIR"] = os.path.join(_data_dir, "groups")
+os.environ["SHEETS_QUOTA_STATE"] = os.path.join(_data_dir, "sheets_quota.json")
+os.environ["SCORING_MODELS_PATH"] = os.path.join(_data_dir, "scoring_models.json")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+class FakeSheets:
+    """Stands in for GoogleSheetsManager, holding the spreadsheet as a dataset"""
+    def __init__(self, data=None, reachable=True):
+        self.sheet_id = 'fake-sheet'
+        self.reachable = reachable
+        self.sheet = object() if reachable else None
+        self.data = data or {'players': {}, 'games': [], 'current_players': []}
+        self.saves = 0
+    
+    def setup_sheets(self):
+        self.sheet = object() if self.reachable else None
+    
+    def read_fingerprint(self):
+        return app.data_fingerprint([game['id'] for game in self.data['games']], list(self.data['players']))
+    
+    def load_data(self, strict=False):
+        return copy.deepcopy(self.data)
+    
+    def save_data(self, data):
+        self.data = copy.deepcopy(data)
+        self.saves += 1
+        return True
+    
+    def get_default_data(self):
+        return {'players': {}, 'games': [], 'current_players': []}
+
+@pytest.fixture
+def fake_sheets():
+    return FakeSheets
@@ -0,0 +1,21 @@
+import pytest
+
+import app
+
+POSITIONS = ['goalkeeper', 'defender', 'left_wing', 'right_wing', 'midfielder', 'forward']
+
+def test_plain_balancing_skips_history(monkeypatch):
+    def no_history(*args, **kwargs):
+        raise AssertionError('history loaded for plain balancing')
+    monkeypatch.setattr(app, 'load_data', no_history)
+    
+    players = [{'name': f'p{i}', 'position': POSITIONS[i % len(POSITIONS)], 'skill_level': i + 1} for i in range(8)]
+    response = app.app.test_client().post('/balance-teams', json={'players': players})
+    assert response.status_code == 200
+    assert 'win_probability' not in response.get_json()
+
+@pytest.mark.parametrize('options', [{'alternatives': 'many'}, {'alternatives': None}, {'timeout': 'soon'}, {'timeout': 0}, {'timeout': 'nan'}])
+def test_balance_rejects_bad_options(options):
+    players = [{'name': f'p{i}', 'position': 'midfielder', 'skill_level': 5} for i in range(6)]
+    response = app.app.test_client().post('/balance-teams', json={'players': players, **options})
+    assert response.status_code == 400
@@ -0,0 +1,51 @@
+import itertools
+import random
+
+import pytest
+
+from app import ConstraintError, SplitPlan, Squad, TeamBalancer
+
+def satisfies(team_a, team_b, together, apart, pins):
+    side = {i: 0 for i in team_a}
+    side.update({i: 1 for i in team_b})
+    return (
+        all(side[i] == side[j] for i, j in together)
+        and all(side[i] != side[j] for i, j in apart)
+        and all(side[i] == team for i, team in pins.items())
+    )
+
+@pytest.mark.parametrize('seed', range(20))
+def test_split_plan_always_satisfies_constraints(seed):
+    rng = random.Random(seed)
+    n = rng.randint(4, 14)
+    players = list(range(n))
+    rng.shuffle(players)
+    # Draw constraints from a hidden feasible split so the plan must accept them
+    hidden = {i: k % 2 for k, i in enumerate(players)}
+    pairs = list(itertools.combinations(range(n), 2))
+    together = [(i, j) for i, j in rng.sample(pairs, 2) if hidden[i] == hidden[j]]
+    apart = [(i, j) for i, j in rng.sample(pairs, 3) if hidden[i] != hidden[j]]
+    pins = {i: hidden[i] for i in rng.sample(range(n), 2)}
+    
+    plan = SplitPlan(n, together, apart, pins)
+    order = list(range(n))
+    for _ in range(200):
+        size_a = plan.random_split(order)
+        assert sorted(order) == list(range(n))
+        assert size_a in (n // 2, n - n // 2)
+        assert satisfies(order[:size_a], order[size_a:], together, apart, pins)
+    
+    random.seed(seed)
+    squad = Squad([f'p{i}' for i in range(n)], ['midfielder'] * n, [rng.randint(1, 10) for _ in range(n)])
+    for team_a, team_b in TeamBalancer.search(squad, 300, plan=plan, top_k=3):
+        assert satisfies(team_a, team_b, together, apart, pins)
+
+def test_split_plan_rejects_contradictions():
+    with pytest.raises(ConstraintError):
+        SplitPlan(4, together=[(0, 1)], apart=[(0, 1)])
+    with pytest.raises(ConstraintError):
+        SplitPlan(4, apart=[(0, 1), (1, 2), (0, 2)])
+    with pytest.raises(ConstraintError):
+        SplitPlan(4, together=[(0, 1)], pins={0: 0, 1: 1})
+    with pytest.raises(ConstraintError):
+        SplitPlan(6, together=[(0, 1), (1, 2), (2, 3)])
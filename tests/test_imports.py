@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+import app
+
+def game(game_id, events):
+    return {
+        'id': game_id,
+        'date': '2026-02-01',
+        'team_a': {'score': 2, 'players': [{'name': 'Ann'}, {'name': 'Cy'}]},
+        'team_b': {'score': 1, 'players': [{'name': 'Bob'}]},
+        'events': events
+    }
+
+def test_compact_events_rejects_duplicate_players():
+    with pytest.raises(ValueError):
+        app.compact_events([{'player': 'Ann', 'goals': 1}, {'player': 'Ann', 'goals': 1}])
+
+def test_ndjson_import_normalizes_list_events():
+    lines = [
+        json.dumps(game('g1', [{'player': 'Ann', 'goals': 2, 'assists': 1, 'rating': 8, 'mvp': True}])),
+        json.dumps(game('g2', [{'player': 'Ann', 'goals': 1}, {'player': 'Ann', 'goals': 1}])),
+        json.dumps(game('g3', {'Bob': [1, 0, None, False]}))
+    ]
+    data = {'players': {}, 'games': [], 'current_players': []}
+    report = app.import_games_stream(lines, data)
+    
+    assert report['imported'] == 2
+    assert report['invalid'] == 1
+    assert report['errors'][0]['record'] == 2
+    assert data['games'][0]['events'] == {'Ann': [2, 1, 8, True]}
+    assert data['players']['Ann']['assists'] == 1
+    assert data['players']['Ann']['mvp_awards'] == 1
+
+def test_interrupted_import_resumes_from_journal():
+    group = 'resume'
+    store = app.tenants.get(group).store
+    lines = [json.dumps(game(f'r{i}', {})) for i in range(7)]
+    
+    def interrupted():
+        yield from lines[:5]
+        raise ConnectionError('client went away')
+    
+    data = app.load_data(group, for_update=True)
+    with pytest.raises(ConnectionError):
+        app.import_games_stream(interrupted(), data, batch_size=2, group=group)
+    assert app.load_data(group)['games'] == []
+    assert store.read_meta()['import_checkpoint'] == 4
+    assert [g['id'] for g in store.read_journal()] == ['r0', 'r1', 'r2', 'r3']
+    
+    data = app.load_data(group, for_update=True)
+    report = app.import_games_stream(iter(lines), data, resume_from=4, batch_size=2, group=group)
+    assert report['complete'] and report['imported'] == 3
+    assert [g['id'] for g in app.load_data(group)['games']] == [f'r{i}' for i in range(7)]
+    assert app.load_data(group)['players']['Ann']['games_played'] == 7
+    assert store.read_journal() == []
+    assert 'import_checkpoint' not in store.read_meta()
+
+def test_aborted_ndjson_request_serves_only_stored_games(monkeypatch):
+    client = app.app.test_client()
+    group = 'aborted'
+    assert client.post(f'/import-data?group={group}', json={
+        'players': {}, 'games': [game('a0', {})], 'current_players': []
+    }).status_code == 200
+    
+    real_validate = app.validate_game
+    def failing_validate(record):
+        if record.get('id') == 'a3':
+            raise RuntimeError('connection reset')
+        return real_validate(record)
+    monkeypatch.setattr(app, 'validate_game', failing_validate)
+    
+    body = ''.join(json.dumps(game(f'a{i}', {})) + '\n' for i in range(1, 5))
+    response = client.post(f'/import-data?group={group}', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 500
+    
+    stored = app.tenants.get(group).store.read()
+    assert [g['id'] for g in app.load_data(group)['games']] == [g['id'] for g in stored['games']] == ['a0']
+
+@pytest.mark.parametrize('body', ['[1, 2]', '"game"', 'null', '{not json'])
+def test_record_game_rejects_non_object_bodies(body):
+    response = app.app.test_client().post('/record-game?group=bodies', data=body, content_type='application/json')
+    assert response.status_code == 400
@@ -0,0 +1,109 @@
+import random
+
+import app
+
+def game(game_id, score_a, score_b):
+    return {
+        'id': game_id,
+        'date': '2026-01-10',
+        'team_a': {'score': score_a, 'players': [{'name': 'Ann'}]},
+        'team_b': {'score': score_b, 'players': [{'name': 'Bob'}]}
+    }
+
+def dataset(*games):
+    players = {name: app.new_player_stats('midfielder', 5) for name in ('Ann', 'Bob')}
+    for g in games:
+        app.apply_game_to_players(players, g)
+    return {'players': players, 'games': list(games), 'current_players': []}
+
+def top_winner(client, group):
+    response = client.get(f'/leaderboard?metric=wins&group={group}')
+    assert response.status_code == 200
+    return response.get_json()['entries'][0]['name']
+
+def test_reimport_with_same_count_and_last_id_rebuilds_indexes():
+    client = app.app.test_client()
+    group = 'reimport'
+    assert client.post(f'/import-data?group={group}', json=dataset(game('g1', 3, 0), game('g2', 2, 1))).status_code == 200
+    assert top_winner(client, group) == 'Ann'
+    
+    # Same number of games and the same last id, but Bob won both
+    assert client.post(f'/import-data?group={group}', json=dataset(game('g1', 0, 3), game('g2', 1, 2))).status_code == 200
+    assert top_winner(client, group) == 'Bob'
+
+def test_recorded_games_are_appended_incrementally():
+    client = app.app.test_client()
+    group = 'append'
+    assert client.post(f'/import-data?group={group}', json=dataset(game('g1', 3, 0))).status_code == 200
+    assert top_winner(client, group) == 'Ann'
+    
+    tenant = app.tenants.get(group)
+    version = tenant.games_version()
+    for game_id in ('g2', 'g3'):
+        assert client.post(f'/record-game?group={group}', json=game(game_id, 0, 1)).status_code == 200
+    assert tenant.games_version() == version
+    assert top_winner(client, group) == 'Bob'
+
+def test_leaderboard_rebuild_matches_incremental_updates():
+    rng = random.Random(5)
+    names = [f'p{i}' for i in range(12)]
+    games = []
+    for i in range(60):
+        rng.shuffle(names)
+        g = game(f'g{i}', rng.randint(0, 3), rng.randint(0, 3))
+        g['team_a']['players'] = [{'name': name} for name in names[:5]]
+        g['team_b']['players'] = [{'name': name} for name in names[5:10]]
+        g['events'] = {names[0]: [rng.randint(0, 2), 0, rng.choice([None, 6.5, 8]), False]}
+        games.append(g)
+    players = {name: app.new_player_stats('midfielder', 5) for name in names}
+    app.ensure_player_ids(players)
+    
+    rebuilt = app.LeaderboardIndex().sync({'players': players, 'games': games})
+    incremental = app.LeaderboardIndex().sync({'players': players, 'games': games[:1]})
+    for count in range(2, len(games) + 1):
+        incremental.sync({'players': players, 'games': games[:count]})
+    
+    for window in app.LeaderboardIndex.WINDOWS:
+        assert rebuilt.boards[window].counters == incremental.boards[window].counters
+        assert rebuilt.boards[window].rankings == incremental.boards[window].rankings
+        assert rebuilt.boards[window]._keys == incremental.boards[window]._keys
+    
+    incremental.sync({'players': players, 'games': games + [game('extra', 1, 0)]})
+    rebuilt.sync({'players': players, 'games': games + [game('extra', 1, 0)]})
+    assert rebuilt.boards['recent'].rankings == incremental.boards['recent'].rankings
+
+def test_rotation_rebuild_matches_incremental_updates():
+    names = [f'p{i}' for i in range(10)]
+    games = []
+    for i in range(3 * app.ROTATION_RECENT_GAMES):
+        g = game(f'g{i}', 1, 0)
+        g['team_a']['players'] = [{'name': names[(i + k) % 10]} for k in range(4)]
+        g['team_b']['players'] = [{'name': names[(i + k) % 10]} for k in range(4, 8)]
+        games.append(g)
+    players = {name: app.new_player_stats('midfielder', 5) for name in names}
+    app.ensure_player_ids(players)
+    
+    rebuilt = app.RotationIndex().sync({'players': players, 'games': games})
+    incremental = app.RotationIndex().sync({'players': players, 'games': games[:1]})
+    for count in range(2, len(games) + 1):
+        incremental.sync({'players': players, 'games': games[:count]})
+    assert rebuilt.matrix(names) == incremental.matrix(names)
+    
+    more = games + [game('extra', 1, 0)]
+    assert rebuilt.sync({'players': players, 'games': more}).matrix(names) == incremental.sync({'players': players, 'games': more}).matrix(names)
+
+def test_saving_the_squad_keeps_game_indexes():
+    client = app.app.test_client()
+    group = 'squad'
+    assert client.post(f'/import-data?group={group}', json=dataset(game('g1', 3, 0))).status_code == 200
+    assert top_winner(client, group) == 'Ann'
+    
+    tenant = app.tenants.get(group)
+    version = tenant.games_version()
+    board = tenant.leaderboard_index.boards['all']
+    squad = [{'name': 'Ann', 'position': 'midfielder', 'skill_level': 5}, {'name': 'Dee', 'position': 'forward', 'skill_level': 7}]
+    assert client.post(f'/save-players?group={group}', json={'players': squad}).status_code == 200
+    
+    assert tenant.games_version() == version
+    assert top_winner(client, group) == 'Ann'
+    assert tenant.leaderboard_index.boards['all'] is board
@@ -0,0 +1,135 @@
+import os
+
+import pytest
+
+import app
+
+def dataset(*game_ids):
+    players = {'Ann': app.new_player_stats('midfielder', 5), 'Bob': app.new_player_stats('defender', 6)}
+    games = [
+        {'id': game_id, 'date': '2026-04-01', 'team_a': {'score': 1, 'players': [{'name': 'Ann'}]}, 'team_b': {'score': 0, 'players': [{'name': 'Bob'}]}}
+        for game_id in game_ids
+    ]
+    for game in games:
+        app.apply_game_to_players(players, game)
+    app.ensure_player_ids(players)
+    return {'players': players, 'games': games, 'current_players': []}
+
+@pytest.fixture
+def store(tmp_path):
+    return app.LocalStore(str(tmp_path / 'group.json'))
+
+def conflict_copies(store):
+    directory, name = os.path.split(store.path)
+    return [entry for entry in os.listdir(directory) if entry.startswith(f'{name}.conflict-')]
+
+def test_local_store_versions_meta_and_summary(store, fake_sheets):
+    assert store.read() is None
+    assert store.read_meta()['version'] == 0
+    
+    assert store.write(dataset('g1')) == 1
+    assert store.write(dataset('g1', 'g2'), games_appended=True) == 2
+    meta = store.read_meta()
+    assert meta['version'] == 2
+    assert meta['games_version'] == 1
+    assert [game['id'] for game in store.read()['games']] == ['g1', 'g2']
+    assert store.read_summary()['total_games'] == 2
+    
+    store.mark_replicated(2, 'fp2')
+    store.mark_replicated(1, 'fp1')
+    assert (store.read_meta()['replicated_version'], store.read_meta()['replicated_fingerprint']) == (2, 'fp2')
+    
+    store.update_meta({'note': 'x'})
+    store.update_meta({'note': None})
+    assert 'note' not in store.read_meta()
+
+def test_replication_pushes_latest_version(store, fake_sheets):
+    sheets = fake_sheets()
+    replicator = app.SheetsReplicator(store, sheets)
+    store.write(dataset('g1'))
+    store.write(dataset('g1', 'g2'))
+    
+    assert replicator.replicate_once()
+    assert sheets.saves == 1
+    assert [game['id'] for game in sheets.data['games']] == ['g1', 'g2']
+    assert replicator.status()['pending_versions'] == 0
+    assert store.read_meta()['replicated_fingerprint'] == sheets.read_fingerprint()
+    assert not replicator.replicate_once()
+    assert sheets.saves == 1
+
+def test_remote_edit_is_saved_aside_and_local_wins(store, fake_sheets):
+    sheets = fake_sheets()
+    replicator = app.SheetsReplicator(store, sheets)
+    store.write(dataset('g1'))
+    replicator.replicate_once()
+    
+    sheets.data = dataset('g1', 'edited')
+    store.write(dataset('g1', 'g2'))
+    assert replicator.replicate_once()
+    
+    assert replicator.stats['conflicts'] == 1
+    assert len(conflict_copies(store)) == 1
+    assert [game['id'] for game in sheets.data['games']] == ['g1', 'g2']
+    assert 'held_conflict' not in store.read_meta()
+
+def test_never_replicated_store_holds_conflict_once(store, fake_sheets):
+    sheets = fake_sheets(dataset('remote'))
+    replicator = app.SheetsReplicator(store, sheets)
+    store.write(dataset('local'))
+    
+    assert not replicator.replicate_once()
+    assert not replicator.replicate_once()
+    held = replicator.status()['held_conflict']
+    assert held['remote_fingerprint'] == sheets.read_fingerprint()
+    assert len(conflict_copies(store)) == 1
+    assert sheets.saves == 0
+    assert [game['id'] for game in sheets.data['games']] == ['remote']
+
+def test_resolve_conflict_keeping_local(store, fake_sheets):
+    sheets = fake_sheets(dataset('remote'))
+    replicator = app.SheetsReplicator(store, sheets)
+    store.write(dataset('local'))
+    replicator.replicate_once()
+    
+    assert replicator.resolve_conflict('local')
+    assert replicator.replicate_once()
+    assert [game['id'] for game in sheets.data['games']] == ['local']
+    assert replicator.status()['pending_versions'] == 0
+    assert not replicator.resolve_conflict('local')
+
+def test_resolve_conflict_keeping_remote(store, fake_sheets):
+    sheets = fake_sheets(dataset('remote'))
+    replicator = app.SheetsReplicator(store, sheets)
+    store.write(dataset('local'))
+    replicator.replicate_once()
+    
+    assert replicator.resolve_conflict('remote')
+    assert [game['id'] for game in store.read()['games']] == ['remote']
+    status = replicator.status()
+    assert status['held_conflict'] is None
+    assert status['pending_versions'] == 0
+    assert not replicator.replicate_once()
+    assert sheets.saves == 0
+
+def test_unreachable_sheets_reconnects_on_a_later_pass(store, fake_sheets):
+    sheets = fake_sheets(reachable=False)
+    replicator = app.SheetsReplicator(store, sheets)
+    store.write(dataset('g1'))
+    
+    with pytest.raises(RuntimeError):
+        replicator.replicate_once()
+    assert replicator.status()['pending_versions'] == 1
+    
+    sheets.reachable = True
+    assert replicator.replicate_once()
+    assert replicator.status()['connected']
+    assert replicator.status()['pending_versions'] == 0
+
+def test_replication_disabled_without_a_sheet(store, fake_sheets):
+    sheets = fake_sheets()
+    sheets.sheet_id = None
+    replicator = app.SheetsReplicator(store, sheets)
+    replicator.start()
+    replicator.notify()
+    assert replicator.thread is None
+    assert not replicator.status()['enabled']
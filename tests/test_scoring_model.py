@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+from app import Player, ScoringModel, TeamBalancer
+
+POSITIONS = ['goalkeeper', 'defender', 'left_wing', 'right_wing', 'midfielder', 'forward']
+
+def baseline_team_strength(players):
+    """calculate_team_strength as it was before scoring models"""
+    if not players:
+        return 0
+    
+    strength = 0
+    position_count = {position: 0 for position in POSITIONS}
+    for player in players:
+        strength += player.skill_level * TeamBalancer.POSITION_WEIGHTS.get(player.position, 1.0)
+        position_count[player.position] += 1
+    
+    if position_count['goalkeeper'] > 0:
+        strength += 3
+    if position_count['defender'] > 0:
+        strength += position_count['defender'] * 0.5
+    if position_count['left_wing'] > 0 or position_count['right_wing'] > 0:
+        strength += 1
+    if position_count['midfielder'] >= 2:
+        strength += 2
+    elif position_count['midfielder'] > 0:
+        strength += 1
+    if position_count['forward'] > 0:
+        strength += position_count['forward'] * 0.3
+    return strength
+
+def builtin_model():
+    return ScoringModel('default', {
+        'position_weights': TeamBalancer.POSITION_WEIGHTS,
+        'bonuses': TeamBalancer.POSITION_BONUSES
+    })
+
+def test_builtin_model_matches_baseline_strength():
+    rng = random.Random(7)
+    model = builtin_model()
+    for _ in range(500):
+        players = [
+            Player(f'p{i}', rng.choice(POSITIONS), rng.randint(1, 10))
+            for i in range(rng.randint(0, 12))
+        ]
+        assert TeamBalancer.calculate_team_strength(players, model) == pytest.approx(baseline_team_strength(players))
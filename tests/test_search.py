@@ -0,0 +1,70 @@
+import itertools
+import random
+
+import pytest
+
+from app import PairTotals, SearchTerms, Squad, TeamBalancer, scoring_models
+
+POSITIONS = ['goalkeeper', 'defender', 'left_wing', 'right_wing', 'midfielder', 'forward']
+
+def random_squad(rng, n):
+    return Squad(
+        [f'p{i}' for i in range(n)],
+        [rng.choice(POSITIONS) for _ in range(n)],
+        [rng.randint(1, 10) for _ in range(n)]
+    )
+
+def random_matrix(rng, n, low, high):
+    matrix = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            matrix[i][j] = matrix[j][i] = rng.uniform(low, high)
+    return matrix
+
+@pytest.mark.parametrize('terms', [
+    {},
+    {'synergy_weight': 2.0},
+    {'prediction_weight': 5.0},
+    {'rotation_weight': 0.5},
+    {'synergy_weight': 1.0, 'prediction_weight': 3.0, 'rotation_weight': 0.5},
+])
+def test_search_scores_match_objective(terms):
+    """The incrementally scored top splits are the true best under objective()"""
+    rng = random.Random(11)
+    n = 10
+    squad = random_squad(rng, n)
+    model = scoring_models.get()
+    terms = SearchTerms(
+        pair_weights=random_matrix(rng, n, -1, 1), synergy_weight=terms.get('synergy_weight', 0.0),
+        ratings=[rng.uniform(1300, 1700) for _ in range(n)], prediction_weight=terms.get('prediction_weight', 0.0),
+        repeat_counts=random_matrix(rng, n, 0, 3), rotation_weight=terms.get('rotation_weight', 0.0)
+    )
+    
+    scores = {}
+    for team_a in itertools.combinations(range(n), n // 2):
+        team_b = [i for i in range(n) if i not in team_a]
+        scores[TeamBalancer.split_key(list(team_a), n)] = TeamBalancer.objective(squad, list(team_a), team_b, model, terms)
+    expected = sorted(scores.values())[:5]
+    
+    random.seed(0)
+    splits = TeamBalancer.search(squad, 20000, model=model, terms=terms, top_k=5)
+    found = [TeamBalancer.objective(squad, team_a, team_b, model, terms) for team_a, team_b in splits]
+    assert found == pytest.approx(expected)
+    assert len({TeamBalancer.split_key(team_a, n) for team_a, _ in splits}) == len(splits)
+
+def test_pair_totals_track_full_recompute():
+    rng = random.Random(3)
+    n = 11
+    matrix = random_matrix(rng, n, -1, 1)
+    order = list(range(n))
+    rng.shuffle(order)
+    size_a = n // 2
+    totals = PairTotals(matrix)
+    totals.reset(order, size_a)
+    for _ in range(300):
+        i, j = rng.randrange(size_a), rng.randrange(size_a, n)
+        a, b = order[i], order[j]
+        totals.apply(a, b, totals.swapped(a, b))
+        order[i], order[j] = b, a
+        assert totals.total_a == pytest.approx(TeamBalancer.pair_total(order[:size_a], matrix))
+        assert totals.total_b == pytest.approx(TeamBalancer.pair_total(order[size_a:], matrix))
@@ -0,0 +1,35 @@
+import app
+
+def game(game_id, team_a, team_b, score_a=1, score_b=0):
+    return {
+        'id': game_id,
+        'date': '2026-03-01',
+        'team_a': {'score': score_a, 'players': [{'name': name} for name in team_a]},
+        'team_b': {'score': score_b, 'players': [{'name': name} for name in team_b]}
+    }
+
+def dataset(*games):
+    players = {}
+    for g in games:
+        for team_key in ('team_a', 'team_b'):
+            for player in g[team_key]['players']:
+                players.setdefault(player['name'], app.new_player_stats('midfielder', 5))
+        app.apply_game_to_players(players, g)
+    return {'players': players, 'games': list(games), 'current_players': []}
+
+def test_rename_leaves_cached_dataset_untouched():
+    client = app.app.test_client()
+    group = 'rename'
+    assert client.post(f'/import-data?group={group}', json=dataset(game('g1', ['Ann'], ['Bob']), game('g2', ['Cy'], ['Bob']))).status_code == 200
+    cached = app.load_data(group)
+    untouched = cached['games'][1]
+    
+    response = client.post(f'/players/rename?group={group}', json={'old_name': 'Ann', 'new_name': 'Anna'})
+    assert response.status_code == 200
+    assert cached['games'][0]['team_a']['players'] == [{'name': 'Ann'}]
+    assert 'Ann' in cached['players']
+    
+    renamed = app.load_data(group)
+    assert renamed['games'][0]['team_a']['players'] == [{'name': 'Anna'}]
+    assert renamed['games'][1] is untouched
+    assert renamed['players']['Anna']['id'] == cached['players']['Ann']['id']
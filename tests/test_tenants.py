@@ -0,0 +1,93 @@
+import threading
+
+import app
+
+def test_new_group_setup_does_not_block_other_groups(monkeypatch):
+    registry = app.TenantRegistry(1 << 20)
+    registry.get('ready')
+    entered = threading.Event()
+    release = threading.Event()
+    real_tenant = app.Tenant
+    
+    def slow_tenant(name):
+        if name == 'slow':
+            entered.set()
+            release.wait(5)
+        return real_tenant(name)
+    monkeypatch.setattr(app, 'Tenant', slow_tenant)
+    
+    worker = threading.Thread(target=registry.get, args=('slow',))
+    worker.start()
+    try:
+        assert entered.wait(5)
+        others = threading.Thread(target=lambda: (registry.get('ready'), registry.get('other')))
+        others.start()
+        others.join(2)
+        assert not others.is_alive()
+    finally:
+        release.set()
+        worker.join()
+    assert registry.get('slow').name == 'slow'
+    assert registry.status()['groups'] == 3
+
+def game(game_id):
+    return {'id': game_id, 'date': '2026-05-01', 'team_a': {'score': 1, 'players': [{'name': 'Ann'}]}, 'team_b': {'score': 0, 'players': [{'name': 'Bob'}]}}
+
+def write_group(registry, name, *game_ids):
+    tenant = registry.get(name)
+    data = {'players': {}, 'games': [game(game_id) for game_id in game_ids], 'current_players': []}
+    version = tenant.store.write(data)
+    registry.remember(tenant, version, data)
+    return tenant
+
+def test_groups_are_isolated():
+    client = app.app.test_client()
+    first = {'players': {}, 'games': [game('north-1')], 'current_players': []}
+    assert client.post('/import-data', json=first, headers={'X-Group-ID': 'north'}).status_code == 200
+    assert client.post('/record-game?group=south', json=game('south-1')).status_code == 200
+    
+    assert [g['id'] for g in app.load_data('north')['games']] == ['north-1']
+    assert [g['id'] for g in app.load_data('south')['games']] == ['south-1']
+    assert app.tenants.get('north').store.path != app.tenants.get('south').store.path
+    assert client.get('/stats/summary?group=south').get_json()['total_games'] == 1
+    assert client.get('/stats/summary?group=nobody').get_json()['total_games'] == 0
+
+def test_invalid_group_ids_are_rejected():
+    client = app.app.test_client()
+    assert client.get('/stats/summary', headers={'X-Group-ID': '../etc'}).status_code == 400
+
+def test_cache_evicts_least_recently_used_group_and_its_indexes():
+    registry = app.TenantRegistry(max_bytes=1)
+    old = write_group(registry, 'cache-old', 'o1')
+    old.leaderboard_index.sync(registry.load(old))
+    assert old.leaderboard_index.boards['all'].counters
+    
+    write_group(registry, 'cache-new', 'n1')
+    assert registry.status()['cached_groups'] == 1
+    assert not old.leaderboard_index.boards['all'].counters
+    assert [g['id'] for g in registry.load(old)['games']] == ['o1']
+
+def test_cached_dataset_is_reloaded_after_another_process_writes():
+    registry = app.TenantRegistry(1 << 20)
+    tenant = write_group(registry, 'cache-stale', 'a')
+    assert [g['id'] for g in registry.load(tenant)['games']] == ['a']
+    
+    app.LocalStore(tenant.store.path).write({'players': {}, 'games': [game('a'), game('b')], 'current_players': []})
+    assert [g['id'] for g in registry.load(tenant)['games']] == ['a', 'b']
+
+def test_idle_tenants_beyond_the_cap_are_dropped(fake_sheets):
+    registry = app.TenantRegistry(1 << 20, max_tenants=2)
+    registry.get(app.DEFAULT_GROUP)
+    busy = registry.get('cap-busy')
+    busy.manager = fake_sheets(reachable=False)
+    busy.replicator.manager = busy.manager
+    busy.store.write({'players': {}, 'games': [], 'current_players': []})
+    assert not busy.idle()
+    
+    registry.get('cap-idle')
+    registry.get('cap-newest')
+    names = set(registry._tenants)
+    assert app.DEFAULT_GROUP in names
+    assert 'cap-busy' in names
+    assert 'cap-idle' not in names
+    assert 'cap-newest' in names